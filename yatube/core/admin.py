@@ -0,0 +1,26 @@
+from django.contrib import admin
+
+from core import jobs
+from core.models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'created',
+    )
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error', 'locked_by', 'locked_at')
+    actions = ('requeue',)
+
+    def requeue(self, request, queryset):
+        count = jobs.requeue(queryset)
+        self.message_user(request, f'Возвращено в очередь задач: {count}')
+    requeue.short_description = 'Вернуть в очередь'
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,260 @@
+"""Бэкенды кэша.
+
+TwoLevelCache держит в памяти процесса небольшой LRU-кэш с коротким
+сроком жизни перед общим кэшем (файловым, memcached), который видят все
+процессы. Записи идут в оба уровня, чтения сначала в локальный. Чужие
+изменения процесс увидит не позже чем через LOCAL_TIMEOUT секунд.
+
+Ключи, которые должны быть видны всем процессам сразу (версии лент,
+счётчики), перечисляются префиксами в SHARED_ONLY и в локальный
+уровень не попадают. Результат incr тоже не запоминается локально.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics
+
+LOCAL = 'local'
+SHARED = 'shared'
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания и промахи get() и get_many() в замеры запроса."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        if value is self._missing:
+            metrics.record_cache(0, 1)
+            return default
+        metrics.record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with metrics.cache_paused():
+            found = super().get_many(keys, version)
+        metrics.record_cache(len(found), len(keys) - len(found))
+        return found
+
+    _missing = object()
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class LocalLRU:
+    """LRU в памяти процесса с ограничением по числу записей и байтам.
+
+    Значения хранятся сериализованными: так известен их размер, а
+    изменение полученного объекта не портит кэш.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires <= time.monotonic():
+                self._pop(key)
+                return None
+            self.entries.move_to_end(key)
+        return data
+
+    def set(self, key, data, timeout):
+        if len(data) > self.max_bytes // 8:
+            self.delete(key)
+            return
+        with self.lock:
+            self._pop(key)
+            self.entries[key] = (time.monotonic() + timeout, data)
+            self.size += len(data)
+            while (len(self.entries) > self.max_entries
+                   or self.size > self.max_bytes):
+                self._pop(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            self._pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class BaseTwoLevelCache(BaseCache):
+    """Локальный LRU перед общим кэшем из CACHES.
+
+    OPTIONS:
+        SHARED — имя общего кэша в CACHES;
+        LOCAL_TIMEOUT — сколько секунд запись живёт в памяти процесса;
+        LOCAL_MAX_ENTRIES, LOCAL_MAX_BYTES — размер локального уровня;
+        SHARED_ONLY — префиксы ключей, которые читаются только из общего
+        кэша.
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.shared_alias = options.pop('SHARED', SHARED)
+        self.local_timeout = options.pop('LOCAL_TIMEOUT', 5)
+        self.shared_only = tuple(options.pop('SHARED_ONLY', ()))
+        self.local = LocalLRU(
+            options.pop('LOCAL_MAX_ENTRIES', 1000),
+            options.pop('LOCAL_MAX_BYTES', 16 * 1024 * 1024),
+        )
+        super().__init__({**params, 'OPTIONS': options})
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def stats(self):
+        """Попадания и промахи по уровням."""
+        with self.stats_lock:
+            return {tier: dict(counts) for tier, counts in self.counts.items()}
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.counts = {
+                LOCAL: {'hits': 0, 'misses': 0},
+                SHARED: {'hits': 0, 'misses': 0},
+            }
+
+    def _count(self, tier, hits, misses):
+        with self.stats_lock:
+            self.counts[tier]['hits'] += hits
+            self.counts[tier]['misses'] += misses
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def _remember(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if key.startswith(self.shared_only):
+            return
+        local_key = self.make_key(key, version)
+        timeout = self._local_timeout(timeout)
+        if timeout <= 0:
+            self.local.delete(local_key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self.local.set(local_key, data, timeout)
+
+    def _recall(self, key, version):
+        if key.startswith(self.shared_only):
+            return self._missing
+        data = self.local.get(self.make_key(key, version))
+        if data is None:
+            return self._missing
+        return pickle.loads(data)
+
+    def _forget(self, key, version):
+        self.local.delete(self.make_key(key, version))
+
+    def get(self, key, default=None, version=None):
+        value = self._recall(key, version)
+        if value is not self._missing:
+            self._count(LOCAL, 1, 0)
+            return value
+        self._count(LOCAL, 0, 1)
+        value = self.shared.get(key, self._missing, version)
+        if value is self._missing:
+            self._count(SHARED, 0, 1)
+            return default
+        self._count(SHARED, 1, 0)
+        self._remember(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._recall(key, version)
+            if value is self._missing:
+                missing.append(key)
+            else:
+                found[key] = value
+        self._count(LOCAL, len(found), len(missing))
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            self._count(SHARED, len(shared), len(missing) - len(shared))
+            for key, value in shared.items():
+                self._remember(key, value, version=version)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._remember(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version) or []
+        for key, value in data.items():
+            if key in failed:
+                self._forget(key, version)
+            else:
+                self._remember(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._remember(key, value, timeout, version)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        # Счётчик меняют все процессы: локальная копия сразу устареет.
+        self._forget(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._forget(key, version)
+        return self.shared.touch(key, timeout, version)
+
+    def has_key(self, key, version=None):
+        if self._recall(key, version) is not self._missing:
+            return True
+        return self.shared.has_key(key, version)
+
+    def delete(self, key, version=None):
+        self._forget(key, version)
+        self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self._forget(key, version)
+        self.shared.delete_many(keys, version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    _missing = object()
+
+
+class TwoLevelCache(InstrumentedCacheMixin, BaseTwoLevelCache):
+    pass
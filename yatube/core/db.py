@@ -0,0 +1,91 @@
+"""Чтение из реплик базы.
+
+Запросы GET и HEAD к страницам из DATABASE_REPLICA_VIEWS читают из
+одной случайной реплики из DATABASE_REPLICAS, всё остальное идёт в
+default. Запрос, который что-то записал, получает cookie на
+DATABASE_PIN_SECONDS секунд: пока она жива, все чтения этого клиента
+идут в default, и он сразу видит свой пост, комментарий или подписку.
+Поэтому реплики должны отставать меньше чем на DATABASE_PIN_SECONDS.
+"""
+import fnmatch
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'pin_primary'
+
+_current = ContextVar('database_routing', default=None)
+
+
+class Routing:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica = False
+        self.alias = None
+        self.wrote = False
+
+
+@contextmanager
+def routing(state):
+    token = _current.set(state)
+    try:
+        yield state
+    finally:
+        _current.reset(token)
+
+
+def reading_from_replica():
+    """Читает ли текущий запрос из реплики."""
+    state = _current.get()
+    return bool(state is not None and state.replica and not state.pinned
+                and settings.DATABASE_REPLICAS)
+
+
+def pinned():
+    """Прикреплён ли текущий запрос к default после своей записи."""
+    state = _current.get()
+    return bool(state is not None and state.pinned
+                and settings.DATABASE_REPLICAS)
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def is_replica_view(view_name):
+    return any(fnmatch.fnmatchcase(view_name, pattern)
+               for pattern in settings.DATABASE_REPLICA_VIEWS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not reading_from_replica():
+            return None
+        state = _current.get()
+        # Одна реплика на весь запрос: реплики могут отставать
+        # по-разному, а страница должна быть согласованной.
+        if state.alias is None:
+            state.alias = random.choice(settings.DATABASE_REPLICAS)
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # В репликах те же данные, что и в default.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает в реплики вместе с данными.
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,134 @@
+"""Очередь фоновых задач в базе.
+
+enqueue() записывает вызов функции в таблицу core.Job в той же
+транзакции, что и остальные изменения запроса: задача не потеряется
+при падении процесса и не появится, если транзакция откатится.
+Команда runworker забирает готовые задачи и выполняет их в пуле
+потоков или процессов. Упавшая задача повторяется с экспоненциальной
+задержкой, а после JOB_MAX_ATTEMPTS попыток остаётся в таблице со
+статусом DEAD.
+
+Аргументы задачи должны сериализоваться в JSON.
+"""
+import json
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(func, *args, run_at=None, max_attempts=None, **kwargs):
+    """Поставить вызов func(*args, **kwargs) в очередь.
+
+    func — функция уровня модуля или её полный путь строкой.
+    """
+    if not isinstance(func, str):
+        func = f'{func.__module__}.{func.__qualname__}'
+    return Job.objects.create(
+        name=func,
+        payload=json.dumps({'args': args, 'kwargs': kwargs}),
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts):
+    """Задержка перед следующей попыткой, с разбросом до 10 %."""
+    delay = min(settings.JOB_RETRY_DELAY * 2 ** (attempts - 1),
+                settings.JOB_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(1, 1.1))
+
+
+def release_stale():
+    """Вернуть в очередь задачи воркеров, не закончивших за JOB_TIMEOUT."""
+    stale = timezone.now() - timedelta(seconds=settings.JOB_TIMEOUT)
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=stale
+    ).update(status=Job.QUEUED, locked_by='')
+
+
+def claim(worker, limit):
+    """Забрать до limit готовых задач; вернуть их id.
+
+    Задачи выбираются и помечаются одним UPDATE с подзапросом, а
+    условие status=QUEUED не даёт двум воркерам взять одну задачу.
+    """
+    release_stale()
+    now = timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'
+    ready = (
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('run_at', 'id')
+        .values('id')[:limit]
+    )
+    claimed = Job.objects.filter(id__in=ready, status=Job.QUEUED).update(
+        status=Job.RUNNING,
+        locked_by=token,
+        locked_at=now,
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return []
+    return list(
+        Job.objects.filter(locked_by=token, status=Job.RUNNING)
+        .values_list('id', flat=True)
+    )
+
+
+def _run(job_id):
+    job = Job.objects.filter(pk=job_id, status=Job.RUNNING).first()
+    if job is None:
+        return None
+    try:
+        payload = json.loads(job.payload)
+        import_string(job.name)(*payload['args'], **payload['kwargs'])
+    except Exception:
+        logger.exception('Задача %s (%s) упала', job.pk, job.name)
+        if job.attempts >= job.max_attempts:
+            status, run_at = Job.DEAD, job.run_at
+        else:
+            status = Job.QUEUED
+            run_at = timezone.now() + retry_delay(job.attempts)
+        # Пока задача выполнялась, её могли вернуть в очередь как
+        # зависшую и отдать другому воркеру: как и в claim(), чья она
+        # сейчас, решает locked_by.
+        mine = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+        updated = mine.update(
+            last_error=traceback.format_exc(),
+            locked_by='',
+            status=status,
+            run_at=run_at,
+        )
+        return status if updated else None
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).delete()
+    return 'done'
+
+
+def execute(job_id):
+    """Выполнить взятую задачу; вернуть 'done', QUEUED или DEAD."""
+    try:
+        return _run(job_id)
+    finally:
+        # Воркер живёт долго: соединение потока не должно висеть.
+        connections.close_all()
+
+
+def requeue(jobs):
+    """Вернуть задачи из queryset в очередь с чистым счётчиком попыток."""
+    return jobs.update(
+        status=Job.QUEUED,
+        attempts=0,
+        run_at=timezone.now(),
+        locked_by='',
+    )
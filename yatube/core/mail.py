@@ -0,0 +1,32 @@
+"""Отправка почты через очередь задач.
+
+QueuedEmailBackend не соединяется с почтовым сервером: каждое письмо
+становится задачей core.jobs, а runworker отправляет его через
+QUEUED_EMAIL_BACKEND. Время ответа больше не зависит от почты, а
+неудачная отправка повторяется.
+"""
+import base64
+import pickle
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from core import jobs
+
+
+def send_queued(data):
+    message = pickle.loads(base64.b64decode(data))
+    connection = get_connection(settings.QUEUED_EMAIL_BACKEND)
+    connection.send_messages([message])
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            # Письмо сериализуется целиком, вместе с HTML-версией и
+            # вложениями; соединение в задачу не попадает.
+            message.connection = None
+            data = base64.b64encode(pickle.dumps(message)).decode()
+            jobs.enqueue(send_queued, data)
+        return len(email_messages)
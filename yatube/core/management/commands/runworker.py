@@ -0,0 +1,99 @@
+import os
+import socket
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+)
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди core.Job'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Сколько задач выполнять одновременно; 1 — выполнять '
+                 'в текущем процессе',
+        )
+        parser.add_argument(
+            '--pool',
+            choices=['thread', 'process'],
+            default='thread',
+            help='Пул потоков для задач с вводом-выводом (почта) или '
+                 'процессов для задач, которые грузят процессор',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выйти, когда готовые задачи закончатся',
+        )
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        size = options['workers']
+        if size == 1:
+            self.run_inline(worker, options['once'])
+            return
+        if options['pool'] == 'process':
+            # Соединения с базой не должны переходить в дочерние процессы.
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=size,
+                                           initializer=django.setup)
+        else:
+            executor = ThreadPoolExecutor(max_workers=size,
+                                          thread_name_prefix='jobs')
+        try:
+            self.run_pool(executor, worker, size, options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановка: дожидаемся начатых задач…')
+        finally:
+            executor.shutdown(wait=True)
+
+    def run_pool(self, executor, worker, size, once):
+        running = set()
+        while True:
+            if len(running) < size:
+                for job_id in jobs.claim(worker, size - len(running)):
+                    running.add(executor.submit(jobs.execute, job_id))
+            if not running:
+                if once:
+                    break
+                time.sleep(settings.JOB_POLL_INTERVAL)
+                continue
+            done, running = wait(
+                running,
+                timeout=settings.JOB_POLL_INTERVAL,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                self.report(future.result())
+
+    def run_inline(self, worker, once):
+        try:
+            while True:
+                claimed = jobs.claim(worker, 1)
+                if not claimed:
+                    if once:
+                        break
+                    time.sleep(settings.JOB_POLL_INTERVAL)
+                    continue
+                self.report(jobs.execute(claimed[0]))
+        except KeyboardInterrupt:
+            self.stdout.write('Остановка')
+
+    def report(self, status):
+        if status is None:
+            return
+        if status == 'done':
+            self.stdout.write(self.style.SUCCESS('Задача выполнена'))
+        else:
+            self.stderr.write(f'Задача упала, состояние: {status}')
@@ -0,0 +1,121 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в новом интерпретаторе: в текущем процессе модули уже
+# загружены. Печатает замеры в JSON последней строкой stdout.
+SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from yatube.wsgi import application
+loaded = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+environ = {'PATH_INFO': sys.argv[1]}
+setup_testing_defaults(environ)
+statuses = []
+response = application(
+    environ, lambda status, headers, exc_info=None: statuses.append(status)
+)
+b''.join(response)
+response.close()
+served = time.perf_counter()
+print(json.dumps({
+    'import': loaded - started,
+    'request': served - loaded,
+    'status': statuses[0],
+}))
+'''
+
+
+def parse_importtime(output):
+    """Строки -X importtime -> [(модуль, собственное мкс, общее мкс)]."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if own.strip().isdigit():
+            modules.append((name.strip(), int(own), int(cumulative)))
+    return modules
+
+
+def profile(path):
+    """Запустить WSGI-приложение с нуля и отдать первый запрос к path."""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT, path],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    total = time.perf_counter() - started
+    if result.returncode:
+        raise CommandError(result.stderr[-2000:])
+    report = json.loads(result.stdout.splitlines()[-1])
+    report['total'] = total
+    report['modules'] = parse_importtime(result.stderr)
+    return report
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет холодный старт: время импорта модулей, загрузки '
+        'yatube.wsgi и первого запроса в новом процессе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/',
+                            help='Адрес первого запроса')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Сколько самых медленных модулей показать')
+        parser.add_argument(
+            '--budget',
+            type=float,
+            help='Предел холодного старта, мс; при превышении — ошибка',
+        )
+
+    def handle(self, *args, **options):
+        report = profile(options['path'])
+        modules = report['modules']
+
+        self.stdout.write(f'Модулей загружено: {len(modules)}')
+        self.stdout.write(
+            'Самые медленные по собственному времени (своё, с вложенными), мс:'
+        )
+        slowest = sorted(modules, key=lambda module: -module[1])
+        for name, own, cumulative in slowest[:options['top']]:
+            self.stdout.write(
+                f'  {own / 1000:8.1f} {cumulative / 1000:8.1f}  {name}'
+            )
+        self.stdout.write('Модули проекта с вложенными импортами, мс:')
+        apps = {
+            name.split('.')[0] for name in settings.INSTALLED_APPS
+            if not name.startswith('django.')
+        }
+        project = [module for module in modules
+                   if module[0].split('.')[0] in apps]
+        project.sort(key=lambda module: -module[2])
+        for name, own, cumulative in project[:options['top']]:
+            self.stdout.write(
+                f'  {own / 1000:8.1f} {cumulative / 1000:8.1f}  {name}'
+            )
+
+        total = report['total'] * 1000
+        self.stdout.write(
+            f'Импорт yatube.wsgi: {report["import"] * 1000:.1f} мс\n'
+            f'Первый запрос {options["path"]} ({report["status"]}): '
+            f'{report["request"] * 1000:.1f} мс\n'
+            f'От запуска процесса до ответа: {total:.1f} мс'
+        )
+        budget = options['budget']
+        if budget is not None and total > budget:
+            raise CommandError(
+                f'Холодный старт {total:.0f} мс больше бюджета {budget:.0f} мс'
+            )
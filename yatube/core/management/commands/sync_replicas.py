@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик из '
+        'DATABASE_REPLICAS; с --interval повторяет копирование'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Через сколько секунд повторять; без него — один раз',
+        )
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError(
+                'Команда нужна только для SQLite; реплики других баз '
+                'настраиваются средствами самой базы'
+            )
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('DATABASE_REPLICAS пуст')
+        while True:
+            started = time.monotonic()
+            for alias in settings.DATABASE_REPLICAS:
+                self.sync(source, settings.DATABASES[alias]['NAME'])
+            self.stdout.write(
+                f'Реплики обновлены за {time.monotonic() - started:.2f} с'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, source, name):
+        # Копия собирается рядом и подменяет реплику целиком: читатели
+        # не ждут блокировок и не видят наполовину скопированный файл.
+        temporary = f'{name}.tmp'
+        source.ensure_connection()
+        target = sqlite3.connect(temporary)
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
+        os.replace(temporary, name)
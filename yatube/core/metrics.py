@@ -0,0 +1,183 @@
+"""Замеры производительности запросов.
+
+Для каждого попавшего в выборку запроса собираются число SQL-запросов,
+время в базе, время отрисовки шаблонов, попадания и промахи кэша и
+общее время ответа. Замеры текущего запроса лежат в contextvar, поэтому
+обёртки базы, кэша и шаблонов работают без ссылки на request. Итоги
+складываются в гистограммы внутри процесса, по имени URL.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Границы корзин гистограмм, мс; последняя корзина — всё, что больше.
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_paused = False
+        self.total_time = 0.0
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing."""
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} SQL"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """Собирать замеры внутри блока; отдаёт объект RequestMetrics."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        metrics.finish()
+        _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper()."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+@contextmanager
+def template_timer():
+    """Засечь время отрисовки; вложенные шаблоны не считаются дважды."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics.template_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.template_depth -= 1
+        if not metrics.template_depth:
+            metrics.template_time += time.perf_counter() - started
+
+
+def record_cache(hits, misses):
+    metrics = _current.get()
+    if metrics is not None and not metrics.cache_paused:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+@contextmanager
+def cache_paused():
+    """Не считать обращения к кэшу внутри блока.
+
+    Нужно для get_many(), который в части бэкендов вызывает get().
+    """
+    metrics = _current.get()
+    if metrics is None or metrics.cache_paused:
+        yield
+        return
+    metrics.cache_paused = True
+    try:
+        yield
+    finally:
+        metrics.cache_paused = False
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'buckets': dict(zip(
+                [str(bound) for bound in BUCKETS] + ['inf'], self.counts
+            )),
+        }
+
+
+class Registry:
+    """Гистограммы по именам URL; общие для всех потоков процесса."""
+    FIELDS = ('total_ms', 'db_ms', 'template_ms', 'queries')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def add(self, name, metrics):
+        values = (
+            metrics.total_time * 1000,
+            metrics.db_time * 1000,
+            metrics.template_time * 1000,
+            metrics.queries,
+        )
+        with self.lock:
+            view = self.views.get(name)
+            if view is None:
+                view = self.views[name] = {
+                    'histograms': {field: Histogram()
+                                   for field in self.FIELDS},
+                    'cache_hits': 0,
+                    'cache_misses': 0,
+                }
+            for field, value in zip(self.FIELDS, values):
+                view['histograms'][field].add(value)
+            view['cache_hits'] += metrics.cache_hits
+            view['cache_misses'] += metrics.cache_misses
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: {
+                    **{field: histogram.as_dict() for field, histogram
+                       in view['histograms'].items()},
+                    'cache_hits': view['cache_hits'],
+                    'cache_misses': view['cache_misses'],
+                }
+                for name, view in self.views.items()
+            }
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = Registry()
@@ -0,0 +1,87 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import db, metrics, static
+
+
+class MetricsMiddleware:
+    """Замеры запроса: заголовок Server-Timing и гистограммы по URL.
+
+    Замеряется только доля METRICS_SAMPLE_RATE запросов, остальные
+    проходят без обёрток.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        with metrics.collect() as collected, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.record_query)
+                )
+            response = self.get_response(request)
+        match = request.resolver_match
+        metrics.registry.add(
+            match.view_name if match else 'unresolved', collected
+        )
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = collected.server_timing()
+        return response
+
+
+class ReplicaMiddleware:
+    """Направляет чтения страниц из DATABASE_REPLICA_VIEWS в реплики.
+
+    Стоит перед SessionMiddleware, чтобы запись сессии при входе тоже
+    прикрепляла клиента к основной базе (core.db).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with db.routing(db.Routing(db.is_pinned(request))) as state:
+            request._routing = state
+            response = self.get_response(request)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                db.PIN_COOKIE,
+                str(int(time.time()) + settings.DATABASE_PIN_SECONDS),
+                max_age=settings.DATABASE_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and db.is_replica_view(request.resolver_match.view_name)):
+            request._routing.replica = True
+
+
+class StaticFilesMiddleware:
+    """Отдаёт STATIC_URL из STATIC_ROOT, если включён STATIC_SERVE.
+
+    Стоит первым: запросы статики не проходят сессии, авторизацию и
+    замеры, а файлы, которых нет, уходят дальше и получают обычный 404.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (settings.STATIC_SERVE and request.method in ('GET', 'HEAD')
+                and request.path_info.startswith(settings.STATIC_URL)):
+            response = static.serve(
+                request, request.path_info[len(settings.STATIC_URL):]
+            )
+            if response is not None:
+                return response
+        return self.get_response(request)
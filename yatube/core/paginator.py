@@ -0,0 +1,117 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (keyset).
+
+    Страница выбирается условием по паре полей сортировки последней
+    показанной записи, поэтому не нужны ни COUNT(*), ни OFFSET, и
+    стоимость запроса не зависит от глубины страницы. Второе поле
+    сортировки должно быть уникальным (обычно id).
+
+    Номера страниц и методы Page.has_next()/has_previous() в этом режиме
+    не используются: ссылки строятся по page.next_cursor и
+    page.previous_cursor.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.ordering = ordering
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+        super().__init__(object_list.order_by(*ordering), per_page)
+
+    def get_page(self, cursor=None):
+        """Вернуть страницу по курсору; битый курсор ведёт на первую."""
+        queryset = self.object_list
+        try:
+            direction, values = self.decode_cursor(cursor)
+            if values is not None:
+                # Значения проверяются полями и при построении условия.
+                queryset = queryset.filter(
+                    self._after(values, direction == PREVIOUS)
+                )
+        except (TypeError, ValueError, ValidationError):
+            direction, values = NEXT, None
+            queryset = self.object_list
+
+        backward = direction == PREVIOUS
+        if backward:
+            queryset = queryset.reverse()
+
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if backward:
+            items.reverse()
+
+        page = Page(items, 1, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if items:
+            if has_more or backward:
+                page.next_cursor = self.encode_cursor(NEXT, items[-1])
+            if (has_more and backward) or (values is not None
+                                           and not backward):
+                page.previous_cursor = self.encode_cursor(
+                    PREVIOUS, items[0]
+                )
+        return page
+
+    def _after(self, values, backward):
+        """Условие «после ключа» в порядке сортировки (или до него).
+
+        Запись вида `a <= x AND (a < x OR b < y)` позволяет SQLite
+        начать обход индекса по первому полю сразу с нужного места.
+        """
+        (first, first_desc), (second, second_desc) = self.fields
+        first_value, second_value = values
+        first_op = 'lt' if first_desc != backward else 'gt'
+        second_op = 'lt' if second_desc != backward else 'gt'
+        return (
+            Q(**{f'{first}__{first_op}e': first_value})
+            & (Q(**{f'{first}__{first_op}': first_value})
+               | Q(**{f'{second}__{second_op}': second_value}))
+        )
+
+    def encode_cursor(self, direction, obj):
+        values = [
+            self._field(name).value_to_string(obj)
+            for name, _ in self.fields
+        ]
+        data = json.dumps([direction] + values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return NEXT, None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, *values = json.loads(
+                base64.urlsafe_b64decode(padded.encode())
+            )
+        except (binascii.Error, UnicodeDecodeError, TypeError):
+            raise ValueError('Некорректный курсор')
+        if direction not in (NEXT, PREVIOUS) or len(values) != 2:
+            raise ValueError('Некорректный курсор')
+        # Курсор пишет encode_cursor: только строки и числа.
+        if not all(isinstance(value, (str, int))
+                   and not isinstance(value, bool) for value in values):
+            raise ValueError('Некорректный курсор')
+        return direction, [
+            self._field(name).to_python(value)
+            for (name, _), value in zip(self.fields, values)
+        ]
+
+    def _field(self, name):
+        return self.object_list.model._meta.get_field(name)
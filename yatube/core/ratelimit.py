@@ -0,0 +1,152 @@
+"""Ограничение частоты запросов.
+
+Счётчик запросов хранится в кэше RATELIMIT_CACHE под ключом окна
+времени и увеличивается атомарным cache.incr: это одно обращение к
+кэшу на запрос, и только первый запрос окна дополнительно создаёт ключ
+через cache.add. Кэш должен быть общим для всех процессов и уметь
+атомарный incr, как memcached; FileBasedCache и локальный уровень
+TwoLevelCache не подходят.
+
+Окно фиксированное: за период rate пропускается не больше limit
+запросов, после чего до конца окна отвечаем 429 с Retry-After.
+
+Ключ корзины:
+    'user' — пользователь, а для анонимов их IP;
+    'ip' — IP-адрес клиента.
+
+Если кэш недоступен, запрос пропускается: из-за упавшего memcached
+сайт не должен отвечать ошибкой, в том числе на вход.
+"""
+import ipaddress
+import logging
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.views import too_many_requests
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+logger = logging.getLogger(__name__)
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60)."""
+    limit, _, period = rate.partition('/')
+    return int(limit), PERIODS[period]
+
+
+def is_trusted_proxy(address):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network.strip(), strict=False)
+        for network in settings.RATELIMIT_TRUSTED_PROXIES
+        if network.strip()
+    )
+
+
+def client_ip(request):
+    """IP клиента с учётом доверенных прокси.
+
+    X-Forwarded-For читается справа налево: правые адреса дописали наши
+    прокси, а всё левее первого чужого адреса прислал сам клиент.
+    """
+    address = request.META.get('REMOTE_ADDR', '')
+    if not is_trusted_proxy(address):
+        return address
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    for hop in reversed(forwarded.split(',')):
+        hop = hop.strip()
+        if not hop:
+            continue
+        address = hop
+        if not is_trusted_proxy(hop):
+            break
+    return address
+
+
+def bucket(request, key):
+    if key == 'user' and request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{client_ip(request)}'
+
+
+def hit(name, ident, rate):
+    """Учесть запрос; вернуть None или через сколько секунд повторить."""
+    limit, period = parse_rate(rate)
+    now = time.time()
+    window = int(now // period)
+    cache_key = f'ratelimit:{name}:{ident}:{window}'
+    cache = caches[settings.RATELIMIT_CACHE]
+    try:
+        count = cache.incr(cache_key)
+    except ValueError:
+        # Окно только началось; если ключ успел создать соседний
+        # процесс, add вернёт False и счёт продолжит incr.
+        if cache.add(cache_key, 1, period + 1):
+            count = 1
+        else:
+            try:
+                count = cache.incr(cache_key)
+            except ValueError:
+                # Ни incr, ни add не прошли: кэш недоступен.
+                logger.warning('Кэш ограничений недоступен: %s', cache_key)
+                return None
+    if count <= limit:
+        return None
+    return max(1, int((window + 1) * period - now + 0.999))
+
+
+def check(request, name, key='user', rate='10/m', methods=None):
+    """Ответ 429, если клиент превысил rate для name, иначе None."""
+    if methods is not None and request.method not in methods:
+        return None
+    retry_after = hit(name, bucket(request, key), rate)
+    if retry_after is None:
+        return None
+    return too_many_requests(request, retry_after)
+
+
+def ratelimit(key='user', rate='10/m', methods=None, name=None):
+    """Декоратор view: ограничить частоту вызовов.
+
+    Например, @ratelimit(key='ip', rate='5/m', methods=('POST',)).
+    """
+    def decorator(view):
+        bucket_name = name or f'{view.__module__}.{view.__qualname__}'
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = check(request, bucket_name, key, rate, methods)
+            if response is not None:
+                return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RateLimitMiddleware:
+    """Ограничения для URL из RATELIMITS.
+
+    RATELIMITS — словарь {имя URL: {'key': ..., 'rate': ...,
+    'methods': [...]}}; так ограничиваются и view из чужих
+    приложений, например LoginView.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = request.resolver_match.view_name
+        options = settings.RATELIMITS.get(name)
+        if options is None:
+            return None
+        return check(request, name, **options)
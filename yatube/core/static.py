@@ -0,0 +1,161 @@
+"""Статика с хешами в именах, заранее сжатая gzip и brotli.
+
+CompressedManifestStaticFilesStorage при collectstatic пишет файлы с
+хешем содержимого в имени (ManifestStaticFilesStorage) и кладёт рядом
+file.css.gz и file.css.br. brotli — необязательная зависимость: без
+неё остаются только .gz.
+
+serve() отдаёт файл из STATIC_ROOT сама, без CDN и nginx: выбирает
+сжатый вариант по Accept-Encoding, а файлам с хешем в имени ставит
+Cache-Control immutable на STATIC_MAX_AGE, ведь при изменении у них
+меняется имя. Остальные файлы проверяются по ETag при каждом запросе.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage
+)
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Уже сжатые форматы: повторное сжатие их не уменьшит.
+COMPRESSED = {
+    'avif', 'br', 'gif', 'gz', 'jpeg', 'jpg', 'mp3', 'mp4', 'png',
+    'webm', 'webp', 'woff', 'woff2', 'zip',
+}
+MIN_SIZE = 256
+# css/base.5f3c2a9b1e7d.css: хеш ManifestStaticFilesStorage из 12 цифр.
+HASHED_NAME = re.compile(
+    r'^(?P<name>.+)\.[0-9a-f]{12}(?P<extension>(\.[^./]+)?)$'
+)
+
+
+def compressors():
+    """[(кодировка, суффикс, функция)] в порядке предпочтения."""
+    result = []
+    if brotli is not None:
+        result.append(('br', '.br', brotli.compress))
+    result.append((
+        'gzip', '.gz',
+        lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+    ))
+    return result
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = set()
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                processed_names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(processed_names):
+            self.compress(name)
+
+    def compress(self, name):
+        """Записать рядом с name сжатые копии, если они меньше."""
+        if name.rpartition('.')[2].lower() in COMPRESSED:
+            return
+        path = self.path(name)
+        with open(path, 'rb') as file:
+            data = file.read()
+        for _, suffix, compress in compressors():
+            compressed = compress(data) if len(data) >= MIN_SIZE else data
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as file:
+                    file.write(compressed)
+            elif os.path.exists(path + suffix):
+                # Осталась от прошлой сборки, когда файл был другим.
+                os.remove(path + suffix)
+
+
+def accepts(accept_encoding, encoding):
+    """Принимает ли клиент encoding: явно или через *, с ненулевым q."""
+    quality = None
+    for item in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        coding = coding.lower()
+        if coding not in (encoding, '*'):
+            continue
+        value = 1.0
+        for param in params:
+            key, _, raw = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    value = float(raw)
+                except ValueError:
+                    value = 0.0
+        # Явно названная кодировка важнее *.
+        if coding == encoding:
+            return value > 0
+        quality = value
+    return bool(quality)
+
+
+def is_hashed(path):
+    """Имя с хешем содержимого из манифеста collectstatic."""
+    match = HASHED_NAME.match(path)
+    if match is None:
+        return False
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return hashed_files.get(match['name'] + match['extension']) == path
+
+
+def serve(request, path):
+    """Ответ с файлом path из STATIC_ROOT или None, если его нет."""
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(fullpath):
+        return None
+
+    encoding = None
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for coding, suffix, _ in compressors():
+        if (accepts(accept_encoding, coding)
+                and os.path.isfile(fullpath + suffix)):
+            encoding = coding
+            fullpath += suffix
+            break
+
+    stat = os.stat(fullpath)
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        content_type, _ = mimetypes.guess_type(path)
+        response = FileResponse(open(fullpath, 'rb'))
+        response['Content-Type'] = (
+            content_type or 'application/octet-stream'
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Vary'] = 'Accept-Encoding'
+    if is_hashed(path):
+        response['Cache-Control'] = (
+            f'public, max-age={settings.STATIC_MAX_AGE}, immutable'
+        )
+    else:
+        response['Cache-Control'] = 'public, no-cache'
+    return response
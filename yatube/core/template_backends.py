@@ -0,0 +1,22 @@
+from django.template.backends import django as backend
+
+from core import metrics
+
+
+class Template(backend.Template):
+    def render(self, context=None, request=None):
+        with metrics.template_timer():
+            return super().render(context, request)
+
+
+class DjangoTemplates(backend.DjangoTemplates):
+    """Бэкенд шаблонов Django, засекающий время отрисовки."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except backend.TemplateDoesNotExist as exc:
+            backend.reraise(exc, self)
@@ -0,0 +1,83 @@
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from core.cache import TwoLevelCache
+
+
+class TwoLevelCacheTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return TwoLevelCache('', {'OPTIONS': {'SHARED': 'shared', **options}})
+
+    def test_shared_between_processes(self):
+        """Запись одного процесса видна другому через общий уровень"""
+        self.cache.set('key', 'value')
+        other = self.make_cache()
+        self.assertEqual(other.get('key'), 'value')
+        self.assertEqual(other.get('key'), 'value')
+        self.assertEqual(other.stats(), {
+            'local': {'hits': 1, 'misses': 1},
+            'shared': {'hits': 1, 'misses': 0},
+        })
+
+    def test_local_copy_expires(self):
+        """Локальная копия живёт не дольше LOCAL_TIMEOUT"""
+        self.cache.set('key', 'old')
+        caches['shared'].set('key', 'new')
+        self.assertEqual(self.cache.get('key'), 'old')
+        with mock.patch('core.cache.time.monotonic',
+                        return_value=time.monotonic() + 10):
+            self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_many(self):
+        """get_many и set_many проходят в общий кэш одним вызовом"""
+        self.cache.set_many({'a': 1, 'b': 2})
+        other = self.make_cache()
+        other.get('a')
+        with mock.patch.object(caches['shared'], 'get_many',
+                               wraps=caches['shared'].get_many) as get_many:
+            self.assertEqual(other.get_many(['a', 'b', 'c']),
+                             {'a': 1, 'b': 2})
+        get_many.assert_called_once_with(['b', 'c'], None)
+
+    def test_size_aware_eviction(self):
+        """Локальный уровень вытесняет давно не читанные записи по размеру"""
+        small = self.make_cache(LOCAL_MAX_BYTES=8 * 1024)
+        small.set('old', 'x' * 500)
+        small.set('recent', 'x' * 500)
+        small.get('old')
+        for number in range(20):
+            small.set(f'new{number}', 'x' * 500)
+        self.assertLessEqual(small.local.size, 8 * 1024)
+        self.assertNotIn(small.make_key('recent'), small.local.entries)
+
+    def test_incr_and_delete(self):
+        """incr и delete меняют оба уровня"""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(caches['shared'].get('counter'), 2)
+        self.cache.delete('counter')
+        self.assertIsNone(self.cache.get('counter'))
+
+    def test_incr_not_remembered(self):
+        """Счётчик, увеличенный другим процессом, виден сразу"""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.make_cache().incr('counter')
+        self.assertEqual(self.cache.get('counter'), 3)
+
+    def test_shared_only(self):
+        """Ключи из SHARED_ONLY не попадают в локальный уровень"""
+        first = self.make_cache(SHARED_ONLY=('feed-version:',))
+        second = self.make_cache(SHARED_ONLY=('feed-version:',))
+        first.set('feed-version:index', 1)
+        self.assertEqual(second.get('feed-version:index'), 1)
+        second.set('feed-version:index', 2)
+        self.assertEqual(first.get('feed-version:index'), 2)
+        self.assertEqual(first.local.entries, {})
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+CALLS = []
+
+
+def remember(*args, **kwargs):
+    CALLS.append((args, kwargs))
+
+
+def fail():
+    raise RuntimeError('сбой')
+
+
+def fail_after_reclaim():
+    """Упасть, когда задачу уже вернули в очередь и забрал другой воркер."""
+    Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+    jobs.claim('second', 1)
+    raise RuntimeError('сбой')
+
+
+def succeed_after_reclaim():
+    """Выполниться, когда задачу уже забрал другой воркер."""
+    Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+    jobs.claim('second', 1)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def work(self):
+        call_command('runworker', once=True, workers=1, stdout=StringIO(),
+                     stderr=StringIO())
+
+    def test_run(self):
+        """runworker выполняет задачу и удаляет её"""
+        jobs.enqueue(remember, 1, 'два', key=[3])
+        self.work()
+        self.assertEqual(CALLS, [((1, 'два'), {'key': [3]})])
+        self.assertFalse(Job.objects.exists())
+
+    def test_run_at(self):
+        """Отложенная задача ждёт своего времени"""
+        jobs.enqueue(remember, run_at=timezone.now() + timedelta(hours=1))
+        self.work()
+        self.assertEqual(CALLS, [])
+
+    def test_retry_and_dead_letter(self):
+        """Упавшая задача повторяется с задержкой, затем остаётся DEAD"""
+        job = jobs.enqueue(fail, max_attempts=2)
+        with self.settings(JOB_RETRY_DELAY=60):
+            self.work()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('RuntimeError', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+
+        Job.objects.update(run_at=timezone.now())
+        self.work()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DEAD, 2))
+
+        jobs.requeue(Job.objects.filter(pk=job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 0))
+
+    def test_claim_once(self):
+        """Задачу забирает только один воркер"""
+        job = jobs.enqueue(remember)
+        self.assertEqual(jobs.claim('first', 10), [job.pk])
+        self.assertEqual(jobs.claim('second', 10), [])
+
+    def test_release_stale(self):
+        """Задача зависшего воркера возвращается в очередь"""
+        job = jobs.enqueue(remember)
+        jobs.claim('first', 1)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.claim('second', 1), [job.pk])
+
+    def test_failure_after_reclaim(self):
+        """Упавший воркер не трогает задачу, которую забрал другой"""
+        job = jobs.enqueue(fail_after_reclaim)
+        [job_id] = jobs.claim('first', 1)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertIsNone(jobs.execute(job_id))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertTrue(job.locked_by.startswith('second:'))
+        self.assertEqual(job.last_error, '')
+
+    def test_success_after_reclaim(self):
+        """Воркер не удаляет задачу, которую уже выполняет другой"""
+        job = jobs.enqueue(succeed_after_reclaim)
+        [job_id] = jobs.claim('first', 1)
+        jobs.execute(job_id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertTrue(job.locked_by.startswith('second:'))
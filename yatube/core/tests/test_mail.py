@@ -0,0 +1,39 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import Job
+
+User = get_user_model()
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+    QUEUED_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class QueuedEmailTests(TestCase):
+    def test_send_through_queue(self):
+        """Письмо уходит не в запросе, а из очереди"""
+        mail.send_mail('Тема', 'Текст', 'from@example.com',
+                       ['to@example.com'])
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Job.objects.count(), 1)
+        call_command('runworker', once=True, workers=1, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Тема')
+        self.assertEqual(mail.outbox[0].to, ['to@example.com'])
+
+    def test_password_reset_enqueued(self):
+        """Сброс пароля ставит письмо в очередь"""
+        User.objects.create_user(username='auth', email='auth@example.com',
+                                 password='secret-password')
+        response = self.client.post(reverse('users:password_reset_form'),
+                                    {'email': 'auth@example.com'})
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Job.objects.get().name, 'core.mail.send_queued')
@@ -0,0 +1,60 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+
+User = get_user_model()
+
+
+@override_settings(METRICS_SAMPLE_RATE=1)
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+
+    def test_server_timing_header(self):
+        """Ответ несёт Server-Timing с базой, шаблонами и кэшем"""
+        response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for name in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            self.assertIn(name, header)
+
+    def test_histograms_by_url_name(self):
+        """Замеры собираются в гистограммы по имени URL"""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        report = metrics.registry.snapshot()['posts:index']
+        self.assertEqual(report['total_ms']['count'], 2)
+        self.assertGreater(report['queries']['sum'], 0)
+        self.assertGreater(report['cache_hits'] + report['cache_misses'], 0)
+
+    def test_cache_hits_and_misses(self):
+        """get_many считает каждый ключ один раз"""
+        cache.set('present', 1)
+        with metrics.collect() as collected:
+            cache.get_many(['present', 'absent'])
+            cache.get('absent')
+        self.assertEqual(collected.cache_hits, 1)
+        self.assertEqual(collected.cache_misses, 2)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        """Запросы вне выборки не замеряются"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(metrics.registry.snapshot(), {})
+
+    def test_report_for_staff_only(self):
+        """Отчёт с гистограммами доступен только персоналу"""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FOUND)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('metrics', response.json()['views'])
+        self.assertIn('local', response.json()['cache'])
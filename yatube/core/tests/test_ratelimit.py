@@ -0,0 +1,103 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.ratelimit import client_ip, ratelimit
+
+User = get_user_model()
+
+
+@override_settings(RATELIMITS={
+    'users:login': {'key': 'ip', 'rate': '2/m', 'methods': ['POST']},
+    'posts:post_create': {'key': 'user', 'rate': '1/m'},
+})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        self.cache = caches[settings.RATELIMIT_CACHE]
+        self.cache.clear()
+
+    def test_limit_by_ip(self):
+        """Сверх лимита вход отвечает 429 с Retry-After"""
+        url = reverse('users:login')
+        data = {'username': 'nobody', 'password': 'wrong'}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, data).status_code,
+                             HTTPStatus.OK)
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertTemplateUsed(response, 'core/429.html')
+        self.assertTrue(1 <= int(response['Retry-After']) <= 60)
+
+        other = self.client_class(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.post(url, data).status_code, HTTPStatus.OK)
+
+    def test_limit_by_user(self):
+        """У каждого пользователя своя корзина"""
+        url = reverse('posts:post_create')
+        for username in ('first', 'second'):
+            self.client.force_login(
+                User.objects.create_user(username=username)
+            )
+            self.assertEqual(self.client.get(url).status_code,
+                             HTTPStatus.OK)
+        self.assertEqual(self.client.get(url).status_code,
+                         HTTPStatus.TOO_MANY_REQUESTS)
+
+    def test_one_cache_call(self):
+        """Запрос внутри окна стоит одного обращения к кэшу"""
+        url = reverse('users:login')
+        self.client.post(url)
+        with mock.patch.object(self.cache, 'incr',
+                               wraps=self.cache.incr) as incr, \
+                mock.patch.object(self.cache, 'add',
+                                  wraps=self.cache.add) as add:
+            self.client.post(url)
+        incr.assert_called_once()
+        add.assert_not_called()
+
+    def test_decorator(self):
+        """Декоратор ограничивает отдельный view"""
+        @ratelimit(key='ip', rate='1/h', methods=('POST',))
+        def view(request):
+            return HttpResponse()
+
+        factory = RequestFactory()
+        self.assertEqual(view(factory.post('/')).status_code, HTTPStatus.OK)
+        self.assertEqual(view(factory.get('/')).status_code, HTTPStatus.OK)
+        response = view(factory.post('/'))
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 3600)
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_client_ip_behind_proxy(self):
+        """За доверенным прокси IP берётся из X-Forwarded-For"""
+        factory = RequestFactory()
+        cases = (
+            ('10.0.0.1', '203.0.113.5', '203.0.113.5'),
+            ('10.0.0.1', '198.51.100.1, 203.0.113.5, 10.0.0.2',
+             '203.0.113.5'),
+            ('10.0.0.1', '', '10.0.0.1'),
+            ('203.0.113.9', '198.51.100.1', '203.0.113.9'),
+        )
+        for remote_addr, forwarded, expected in cases:
+            with self.subTest(remote_addr=remote_addr, forwarded=forwarded):
+                request = factory.get('/', REMOTE_ADDR=remote_addr,
+                                      HTTP_X_FORWARDED_FOR=forwarded)
+                self.assertEqual(client_ip(request), expected)
+
+    def test_cache_unavailable(self):
+        """Без кэша запросы пропускаются, а не падают с 500"""
+        url = reverse('users:login')
+        with mock.patch.object(self.cache, 'incr', side_effect=ValueError), \
+                mock.patch.object(self.cache, 'add', return_value=False), \
+                self.assertLogs('core.ratelimit', 'WARNING'):
+            for _ in range(3):
+                self.assertEqual(self.client.post(url).status_code,
+                                 HTTPStatus.OK)
@@ -0,0 +1,105 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import db
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        # Запросы выполняются в default, а выбор роутера записывается:
+        # базы replica в тестах нет.
+        self.reads = []
+        real = db.ReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            self.reads.append(real(router, model, **hints))
+            return None
+
+        patcher = mock.patch.object(db.ReplicaRouter, 'db_for_read',
+                                    db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_feeds_read_from_replica(self):
+        """Ленты и страница поста читают из реплики"""
+        self.client.get(reverse('posts:index'))
+        self.assertTrue(self.reads)
+        self.assertEqual(set(self.reads), {'replica'})
+
+    def test_other_views_read_from_primary(self):
+        """Остальные страницы читают из default"""
+        self.client.force_login(self.user)
+        self.client.get(reverse('posts:follow_index'))
+        self.assertTrue(self.reads)
+        self.assertEqual(set(self.reads), {None})
+
+    def test_pinned_after_write(self):
+        """После записи клиент читает из default, пока жива cookie"""
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Новый пост'})
+        self.assertIn(db.PIN_COOKIE, response.cookies)
+        self.reads.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый пост')
+        self.assertEqual(set(self.reads), {None})
+
+        self.client.cookies[db.PIN_COOKIE] = str(int(time.time()) - 1)
+        self.reads.clear()
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(set(self.reads), {'replica'})
+
+    def test_no_pin_without_replicas(self):
+        """Без реплик cookie не ставится"""
+        self.client.force_login(self.user)
+        with self.settings(DATABASE_REPLICAS=[]):
+            response = self.client.post(reverse('posts:post_create'),
+                                        {'text': 'Новый пост'})
+        self.assertNotIn(db.PIN_COOKIE, response.cookies)
+
+    def test_migrations_skip_replicas(self):
+        """Миграции не применяются к репликам"""
+        router = db.ReplicaRouter()
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+
+
+class SyncReplicasTests(TransactionTestCase):
+    # Копия снимается с зафиксированных данных, поэтому без транзакции
+    # TestCase вокруг теста.
+
+    def test_sync_replicas(self):
+        """sync_replicas копирует основную базу в файлы реплик"""
+        User.objects.create_user(username='auth')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        name = os.path.join(directory, 'replica.sqlite3')
+        replica = {'replica': {'NAME': name}}
+        with mock.patch.dict(settings.DATABASES, replica), \
+                self.settings(DATABASE_REPLICAS=['replica']):
+            call_command('sync_replicas', stdout=StringIO())
+        replica = sqlite3.connect(name)
+        try:
+            usernames = replica.execute(
+                'SELECT username FROM auth_user'
+            ).fetchall()
+        finally:
+            replica.close()
+        self.assertEqual(usernames, [('auth',)])
@@ -0,0 +1,46 @@
+import importlib
+import os
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.management.commands.startup_profile import parse_importtime
+from core.models import Job
+
+
+class StartupTests(TestCase):
+    def test_import_has_no_side_effects(self):
+        """Импорт модулей проекта не отправляет писем"""
+        for name in ('users.views', 'posts.views', 'core.views'):
+            importlib.reload(importlib.import_module(name))
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(Job.objects.exists())
+
+    def test_parse_importtime(self):
+        """Вывод -X importtime разбирается в собственное и общее время"""
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   posts.models\n'
+            'import time:        80 |        200 | posts\n'
+            'Traceback: не строка замера\n'
+        )
+        self.assertEqual(parse_importtime(output), [
+            ('posts.models', 120, 120),
+            ('posts', 80, 200),
+        ])
+
+    # Замер по часам зависит от загрузки машины, поэтому тест включается
+    # явно: YATUBE_STARTUP_TEST=1 python manage.py test core.
+    @skipUnless(os.environ.get('YATUBE_STARTUP_TEST'),
+                'нужна переменная окружения YATUBE_STARTUP_TEST')
+    def test_cold_start_budget(self):
+        """Холодный старт укладывается в STARTUP_BUDGET_MS"""
+        out = StringIO()
+        call_command('startup_profile', path='/about/author/',
+                     budget=settings.STARTUP_BUDGET_MS, stdout=out)
+        self.assertIn('Первый запрос /about/author/ (200 OK)',
+                      out.getvalue())
@@ -0,0 +1,117 @@
+import gzip
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+
+from core import static
+
+
+STYLE = 'body { background: url("../img/logo.png"); }\n' * 20
+
+
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.source = tempfile.mkdtemp()
+        cls.root = tempfile.mkdtemp()
+        cls.static_settings = override_settings(
+            STATICFILES_DIRS=[cls.source],
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder',
+            ],
+            STATICFILES_STORAGE=(
+                'core.static.CompressedManifestStaticFilesStorage'
+            ),
+            STATIC_ROOT=cls.root,
+            STATIC_SERVE=True,
+        )
+        cls.static_settings.enable()
+        super().setUpClass()
+        os.makedirs(os.path.join(cls.source, 'css'))
+        os.makedirs(os.path.join(cls.source, 'img'))
+        with open(os.path.join(cls.source, 'css', 'site.css'), 'w') as f:
+            f.write(STYLE)
+        with open(os.path.join(cls.source, 'img', 'logo.png'), 'wb') as f:
+            f.write(b'\x89PNG' + bytes(range(256)) * 4)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.static_settings.disable()
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(cls.root, ignore_errors=True)
+
+    def hashed(self, name):
+        return staticfiles_storage.stored_name(name)
+
+    def test_collectstatic(self):
+        """collectstatic пишет имена с хешем и сжатые копии"""
+        css = self.hashed('css/site.css')
+        png = self.hashed('img/logo.png')
+        self.assertRegex(css, r'^css/site\.[0-9a-f]{12}\.css$')
+        with gzip.open(os.path.join(self.root, css + '.gz')) as f:
+            self.assertIn(png.split('/')[-1], f.read().decode())
+        self.assertTrue(os.path.exists(
+            os.path.join(self.root, 'css', 'site.css.gz')
+        ))
+        # PNG уже сжат.
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, png + '.gz')
+        ))
+        self.assertEqual(
+            os.path.exists(os.path.join(self.root, css + '.br')),
+            static.brotli is not None,
+        )
+
+    def test_serve_compressed(self):
+        """Сжатая копия выбирается по Accept-Encoding"""
+        url = settings.STATIC_URL + self.hashed('css/site.css')
+        png = self.hashed('img/logo.png').split('/')[-1]
+        cases = (
+            ('gzip, deflate', 'gzip'),
+            ('*', 'br' if static.brotli else 'gzip'),
+            ('gzip;q=0, identity', None),
+            ('', None),
+        )
+        for accept_encoding, encoding in cases:
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.client.get(
+                    url, HTTP_ACCEPT_ENCODING=accept_encoding
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                self.assertEqual(response['Content-Type'], 'text/css')
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+                body = b''.join(response.streaming_content)
+                if encoding == 'br':
+                    continue
+                if encoding == 'gzip':
+                    body = gzip.decompress(body)
+                self.assertIn(png, body.decode())
+
+    def test_cache_control(self):
+        """Файлы с хешем кэшируются навсегда, остальные проверяются"""
+        url = settings.STATIC_URL + self.hashed('img/logo.png')
+        response = self.client.get(url)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(f'max-age={settings.STATIC_MAX_AGE}',
+                      response['Cache-Control'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        response = self.client.get(settings.STATIC_URL + 'img/logo.png')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+    def test_missing_and_outside(self):
+        """Чужие и несуществующие пути не отдаются"""
+        request = RequestFactory().get('/')
+        for path in ('css/none.css', '../manage.py', '/etc/passwd', 'css'):
+            with self.subTest(path=path):
+                self.assertIsNone(static.serve(request, path))
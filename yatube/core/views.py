@@ -1,6 +1,11 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import JsonResponse
 from django.shortcuts import render
 from http import HTTPStatus
 
+from core import metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path},
@@ -22,3 +27,20 @@ def permission_denied(request, exception):
     return render(request, 'core/403.html',
                   status=HTTPStatus.FORBIDDEN
                   )
+
+
+def too_many_requests(request, retry_after):
+    response = render(request, 'core/429.html',
+                      {'retry_after': retry_after},
+                      status=HTTPStatus.TOO_MANY_REQUESTS
+                      )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+@staff_member_required
+def metrics_report(request):
+    report = {'views': metrics.registry.snapshot()}
+    if hasattr(cache, 'stats'):
+        report['cache'] = cache.stats()
+    return JsonResponse(report)
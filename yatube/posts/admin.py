@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 
+from posts import search
 from posts.models import Post, Group, Comment, Follow
 
 
@@ -16,6 +18,15 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        match = search.to_match(search_term)
+        if not match or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        ids = RawSQL(*search.match_sql(match))
+        return queryset.filter(id__in=ids), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,181 @@
+"""JSON-версии лент и страницы поста для мобильных клиентов.
+
+Ответы отдаются без шаблонов, страницы выбираются по курсору. ETag
+считается по версиям кэша лент (posts.cache) и самому новому посту
+ленты (pub_date, id) одним запросом по индексу, поэтому на
+If-None-Match с неизменившимся ETag приходит 304 без выборки ленты.
+"""
+import hashlib
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_GET
+
+from core.paginator import CursorPaginator
+from posts import timeline
+from posts.cache import (
+    INDEX, get_version, group_namespace, profile_namespace
+)
+from posts.models import Group, Post, User
+
+
+def _json(data):
+    return JsonResponse(data, json_dumps_params={
+        'ensure_ascii': False,
+        'separators': (',', ':'),
+    })
+
+
+def _login_required(view):
+    """login_required для JSON: анониму 401, а не редирект на вход."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Требуется авторизация'},
+                status=HTTPStatus.UNAUTHORIZED,
+                json_dumps_params={'ensure_ascii': False},
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _etag(*parts):
+    data = ':'.join(map(str, parts)).encode()
+    return hashlib.md5(data).hexdigest()
+
+
+def _newest(posts):
+    return (
+        posts.order_by('-pub_date', '-id')
+        .values_list('pub_date', 'id')
+        .first()
+    )
+
+
+def _feed_etag(request, newest, *namespaces):
+    versions = [get_version(namespace) for namespace in namespaces]
+    return _etag(*versions, newest, request.GET.get('cursor', ''))
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'image': post.image.url if post.image else None,
+        'comments_count': post.comments_count,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def _page(request, objects, serialize, **kwargs):
+    paginator = CursorPaginator(objects, settings.MAX_NUMBER_POST, **kwargs)
+    return _page_data(paginator.get_page(request.GET.get('cursor')),
+                      serialize)
+
+
+def _page_data(page, serialize):
+    return {
+        'results': [serialize(obj) for obj in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def _feed_response(request, posts):
+    return _json(_page(request, posts.for_feed(), serialize_post))
+
+
+def _index_etag(request):
+    return _feed_etag(request, _newest(Post.objects.all()), INDEX)
+
+
+@require_GET
+@condition(etag_func=_index_etag)
+def index(request):
+    return _feed_response(request, Post.objects.all())
+
+
+def _group_etag(request, slug):
+    return _feed_etag(
+        request,
+        _newest(Post.objects.filter(group__slug=slug)),
+        group_namespace(slug),
+    )
+
+
+@require_GET
+@condition(etag_func=_group_etag)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _feed_response(request, group.posts.all())
+
+
+def _profile_etag(request, username):
+    return _feed_etag(
+        request,
+        _newest(Post.objects.filter(author__username=username)),
+        profile_namespace(username),
+    )
+
+
+@require_GET
+@condition(etag_func=_profile_etag)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return _feed_response(request, author.posts.all())
+
+
+def _follow_etag(request):
+    # Версия профиля читателя меняется при его подписках и отписках,
+    # версия главной — при любой правке постов, в том числе больших
+    # авторов, которых нет в записях ленты.
+    return _feed_etag(
+        request,
+        timeline.newest(request.user),
+        INDEX,
+        profile_namespace(request.user.username),
+    )
+
+
+@require_GET
+@_login_required
+@condition(etag_func=_follow_etag)
+def follow_index(request):
+    page = timeline.page(request.user, request.GET.get('cursor'),
+                         settings.MAX_NUMBER_POST)
+    return _json(_page_data(page, serialize_post))
+
+
+def _post_etag(request, post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'updated', 'comments_count'
+    ).first()
+    return _etag(post, request.GET.get('cursor', ''))
+
+
+@require_GET
+@condition(etag_func=_post_etag)
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    comments = _page(
+        request,
+        post.comments.select_related('author'),
+        serialize_comment,
+        ordering=('created', 'id'),
+    )
+    return _json({'post': serialize_post(post), 'comments': comments})
@@ -0,0 +1,188 @@
+"""Версионированный кэш страниц лент.
+
+Каждая лента (главная, группа, профиль) кэшируется в своём пространстве
+имён с номером версии. Сигналы о записи постов, комментариев и подписок
+увеличивают версию затронутых лент, поэтому страницы живут в кэше долго
+и при этом не устаревают: старые ключи просто перестают запрашиваться.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+
+from core import db
+from posts.models import Group, Post, User
+
+INDEX = 'index'
+
+
+def group_namespace(slug):
+    return f'group:{slug}'
+
+
+def profile_namespace(username):
+    return f'profile:{username}'
+
+
+def _version_key(namespace):
+    return f'feed-version:{namespace}'
+
+
+def _new_version():
+    # Версия от времени, а не 1: если ключ версии вытеснят из кэша,
+    # новая версия не совпадёт с той, под которой лежат старые страницы.
+    return int(time.time() * 1000)
+
+
+def get_version(namespace):
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(namespaces):
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def bump(*namespaces):
+    """Сделать устаревшими закэшированные страницы лент.
+
+    Внутри транзакции версия увеличивается сразу и ещё раз после
+    фиксации: чтение между ними видит старые данные и кладёт страницу
+    под промежуточную версию, которую второе увеличение отбрасывает.
+    """
+    _bump(namespaces)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(namespaces))
+
+
+def cache_feed(namespace):
+    """Кэшировать страницу ленты в версионированном пространстве имён.
+
+    namespace — строка или функция от именованных аргументов view.
+    Кэшируются только страницы анонимов: у авторизованного в странице
+    его имя и подписки, а cache_page внутри view не видит Vary: Cookie,
+    который SessionMiddleware добавит позже.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Клиент после своей записи не должен получить из кэша
+            # страницу, собранную по ещё не догнавшей реплике.
+            if request.user.is_authenticated or db.pinned():
+                return view(request, *args, **kwargs)
+            name = namespace(**kwargs) if callable(namespace) else namespace
+            timeout = settings.FEED_CACHE_TIMEOUT
+            if db.reading_from_replica():
+                timeout = settings.DATABASE_REPLICA_CACHE_TIMEOUT
+            cached_view = cache_page(
+                timeout,
+                key_prefix=f'{name}:{get_version(name)}',
+            )(view)
+            return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def conditional_for_anonymous(stamp):
+    """Отвечать 304 анонимам, если страница не менялась.
+
+    stamp(**kwargs) возвращает момент последнего изменения страницы
+    одним запросом. Из него строятся Last-Modified и ETag: у ETag
+    точность до микросекунд, а Last-Modified округляется до секунды.
+    Страницы авторизованных пользователей зависят от пользователя,
+    поэтому отдаются без условий. Анонимам страница отдаётся с
+    max-age=0, чтобы браузер и прокси перепроверяли её каждый раз.
+    """
+    def get_stamp(request, **kwargs):
+        if not hasattr(request, '_page_stamp'):
+            request._page_stamp = stamp(**kwargs)
+        return request._page_stamp
+
+    def get_etag(request, **kwargs):
+        value = get_stamp(request, **kwargs)
+        if value is None:
+            return None
+        data = f'{value.timestamp():.6f}:{request.get_full_path()}'
+        return hashlib.md5(data.encode()).hexdigest()
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=get_etag, last_modified_func=get_stamp
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, max_age=0)
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_post(author_id, *group_ids):
+    """Сбросить ленты, в которых показывается пост."""
+    usernames = User.objects.filter(pk=author_id).values_list(
+        'username', flat=True
+    )
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    )
+    bump(
+        INDEX,
+        *map(profile_namespace, usernames),
+        *map(group_namespace, slugs),
+    )
+
+
+def invalidate_author(user_id, *usernames):
+    """Сбросить ленты, где показано имя автора.
+
+    usernames — прежнее и новое имя, если оно поменялось.
+    """
+    slugs = Group.objects.filter(posts__author_id=user_id).values_list(
+        'slug', flat=True
+    ).distinct()
+    bump(
+        INDEX,
+        *map(profile_namespace, set(usernames)),
+        *map(group_namespace, slugs),
+    )
+
+
+def invalidate_comment(post_id):
+    """Сбросить ленты поста, у которого изменились комментарии."""
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if post is None:
+        return
+    username, slug = post
+    namespaces = [INDEX, profile_namespace(username)]
+    if slug is not None:
+        namespaces.append(group_namespace(slug))
+    bump(*namespaces)
+
+
+def invalidate_profiles(*user_ids):
+    """Сбросить профили, у которых изменились подписки."""
+    usernames = User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True
+    )
+    bump(*map(profile_namespace, usernames))
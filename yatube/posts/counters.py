@@ -0,0 +1,121 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарными UPDATE с F()-выражениями из сигналов
+(posts.signals); recount() пересчитывает их целиком, если значения
+разошлись с данными. Вместе со счётчиком обновляется поле updated: по
+нему страницы профиля, группы и поста отвечают на If-Modified-Since.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(
+        **{field: F(field) + delta}, updated=timezone.now()
+    )
+
+
+def change_user(user_id, field, delta):
+    updated = _change(
+        UserCounters.objects.filter(user_id=user_id), field, delta
+    )
+    if not updated and delta > 0:
+        recount_user(user_id)
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_post(post_id, delta):
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def touch(user_id, *group_ids):
+    """Отметить изменение профиля автора и его групп."""
+    now = timezone.now()
+    UserCounters.objects.filter(user_id=user_id).update(updated=now)
+    group_ids = [pk for pk in group_ids if pk is not None]
+    if group_ids:
+        Group.objects.filter(pk__in=group_ids).update(updated=now)
+
+
+def touch_post(post_id):
+    """Отметить изменение профиля и группы, где показан пост."""
+    now = timezone.now()
+    UserCounters.objects.filter(user__posts=post_id).update(updated=now)
+    Group.objects.filter(posts=post_id).update(updated=now)
+
+
+def recount_user(user_id):
+    UserCounters.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id
+            ).count(),
+        },
+    )
+
+
+def _count(model, field):
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def recount_follows(user_ids):
+    """Пересчитать счётчики подписок пользователей одним запросом."""
+    UserCounters.objects.filter(user_id__in=user_ids).update(
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+        updated=timezone.now(),
+    )
+
+
+def _recount(queryset, **counts):
+    """Записать счётчики только там, где они разошлись с данными.
+
+    updated меняется лишь у этих строк: иначе пересчёт сбросил бы
+    карточки постов и ETag страниц всего сайта.
+    """
+    actual = {f'actual_{name}': count for name, count in counts.items()}
+    return queryset.annotate(**actual).exclude(**{
+        name: F(f'actual_{name}') for name in counts
+    }).update(**counts, updated=timezone.now())
+
+
+def recount():
+    """Пересчитать все счётчики по данным в базе."""
+    UserCounters.objects.bulk_create(
+        [
+            UserCounters(user_id=pk)
+            for pk in User.objects.filter(
+                counters__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    _recount(
+        UserCounters.objects.all(),
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
+    _recount(Group.objects.all(), posts_count=_count(Post, 'group'))
+    _recount(Post.objects.all(), comments_count=_count(Comment, 'post'))
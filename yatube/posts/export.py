@@ -0,0 +1,104 @@
+"""Потоковая выгрузка постов и комментариев в CSV и JSON Lines.
+
+Строки читаются через QuerySet.iterator() пачками по chunk_size (в
+PostgreSQL — серверным курсором) и сразу превращаются в текст, поэтому
+память не растёт с числом записей.
+"""
+import csv
+import datetime as dt
+import json
+
+from django.utils import timezone
+
+from posts.models import Comment, Post
+
+CHUNK_SIZE = 2000
+
+COLUMNS = {
+    'posts': (
+        ('id', 'id'),
+        ('pub_date', 'pub_date'),
+        ('author', 'author__username'),
+        ('group', 'group__slug'),
+        ('comments_count', 'comments_count'),
+        ('text', 'text'),
+    ),
+    'comments': (
+        ('id', 'id'),
+        ('post', 'post_id'),
+        ('created', 'created'),
+        ('author', 'author__username'),
+        ('group', 'post__group__slug'),
+        ('text', 'text'),
+    ),
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(dt.datetime.combine(day, dt.time.min))
+
+
+def rows(kind='posts', date_from=None, date_to=None, group=None,
+         chunk_size=CHUNK_SIZE):
+    """Кортежи значений выгрузки в порядке id."""
+    if kind == 'posts':
+        queryset, date_field, group_field = Post.objects, 'pub_date', 'group'
+    else:
+        queryset, date_field = Comment.objects, 'created'
+        group_field = 'post__group'
+    filters = {}
+    if date_from:
+        filters[f'{date_field}__gte'] = _day_start(date_from)
+    if date_to:
+        filters[f'{date_field}__lt'] = _day_start(
+            date_to + dt.timedelta(days=1)
+        )
+    if group:
+        filters[group_field] = group
+    fields = [field for _, field in COLUMNS[kind]]
+    return (
+        queryset.filter(**filters)
+        .order_by('id')
+        .values_list(*fields)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Line:
+    """Файлоподобный объект для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def _text(value):
+    if isinstance(value, dt.datetime):
+        return value.isoformat()
+    return value
+
+
+def as_csv(kind, values):
+    writer = csv.writer(_Line())
+    yield writer.writerow([name for name, _ in COLUMNS[kind]])
+    for row in values:
+        yield writer.writerow([_text(value) for value in row])
+
+
+def as_jsonl(kind, values):
+    names = [name for name, _ in COLUMNS[kind]]
+    for row in values:
+        data = dict(zip(names, map(_text, row)))
+        yield json.dumps(data, ensure_ascii=False) + '\n'
+
+
+WRITERS = {'csv': as_csv, 'jsonl': as_jsonl}
+
+
+def lines(kind='posts', format='csv', **filters):
+    """Строки выгрузки в нужном формате."""
+    return WRITERS[format](kind, rows(kind, **filters))
@@ -0,0 +1,66 @@
+"""Массовые подписки и отписки.
+
+Связи меняются одним запросом, без сигналов на каждую запись; затем
+одним запросом пересчитываются счётчики затронутых пользователей,
+перестраиваются их ленты и сбрасываются закэшированные профили.
+"""
+from django.db import connection, transaction
+
+from posts import cache, counters, timeline
+from posts.models import Follow
+
+
+def _after_change(user_ids, author_ids):
+    was_big = timeline.big_authors(author_ids)
+    counters.recount_follows(user_ids | author_ids)
+    timeline.rebuild(user_ids)
+    timeline.refill_dropped(was_big)
+    cache.invalidate_profiles(*user_ids, *author_ids)
+
+
+def follow_many(pairs):
+    """Подписать пользователей на авторов.
+
+    pairs — пары (user_id, author_id). Подписки на себя и уже
+    существующие подписки пропускаются. Возвращает число пар,
+    переданных на вставку.
+    """
+    pairs = {(user_id, author_id) for user_id, author_id in pairs
+             if user_id != author_id}
+    if not pairs:
+        return 0
+    user_ids = {user_id for user_id, _ in pairs}
+    author_ids = {author_id for _, author_id in pairs}
+    with transaction.atomic():
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in pairs],
+            ignore_conflicts=True,
+        )
+        _after_change(user_ids, author_ids)
+    return len(pairs)
+
+
+def unfollow_many(follows):
+    """Удалить подписки из queryset модели Follow одним DELETE.
+
+    Например, отписать всех от участников удалённой группы:
+    unfollow_many(Follow.objects.filter(author__in=members)).
+    Возвращает число удалённых подписок.
+    """
+    with transaction.atomic():
+        pairs = list(follows.values_list('user_id', 'author_id'))
+        if not pairs:
+            return 0
+        # Обычный delete() отправил бы post_delete на каждую запись.
+        ids, params = follows.values('pk').query.sql_with_params()
+        table = connection.ops.quote_name(Follow._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE id IN ({ids})',
+                           params)
+            deleted = cursor.rowcount
+        _after_change(
+            {user_id for user_id, _ in pairs},
+            {author_id for _, author_id in pairs},
+        )
+    return deleted
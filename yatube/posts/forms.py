@@ -1,6 +1,7 @@
 from django import forms
 
-from .models import Post, Comment
+from . import images
+from .models import Comment, Group, Post
 
 
 class PostForm(forms.ModelForm):
@@ -8,8 +9,42 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if 'image' not in self.changed_data:
+            return image
+        # Размеры и форматы записывает задача posts.thumbnails.generate,
+        # когда копии картинки уже сохранены.
+        self.instance.image_width = self.instance.image_height = None
+        self.instance.image_formats = ''
+        if not image:
+            return image
+        return images.normalize(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class ExportForm(forms.Form):
+    KINDS = (('posts', 'Посты'), ('comments', 'Комментарии'))
+    FORMATS = (('csv', 'CSV'), ('jsonl', 'JSON Lines'))
+
+    kind = forms.ChoiceField(choices=KINDS, required=False)
+    format = forms.ChoiceField(choices=FORMATS, required=False)
+    date_from = forms.DateField(required=False, label='С даты')
+    date_to = forms.DateField(required=False, label='По дату')
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+        label='Группа',
+    )
+
+    def clean_kind(self):
+        return self.cleaned_data['kind'] or 'posts'
+
+    def clean_format(self):
+        return self.cleaned_data['format'] or 'csv'
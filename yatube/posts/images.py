@@ -0,0 +1,238 @@
+"""Обработка картинок постов при загрузке.
+
+Загруженная картинка проверяется по заголовку до декодирования,
+поворачивается по EXIF, уменьшается до POST_IMAGE_MAX_SIZE и
+пересохраняется в JPEG без метаданных. Уменьшенные копии ширин из
+POST_IMAGE_WIDTHS лежат в отдельном каталоге каждого файла хранилища:
+posts/cat.jpg, posts/variants/cat.jpg/320w.jpg,
+posts/variants/cat.jpg/640w.jpg. Из них шаблон собирает srcset.
+
+Те же размеры сохраняются в WebP и AVIF, если установленный Pillow
+умеет их записывать (posts/variants/cat.jpg/full.webp,
+posts/variants/cat.jpg/320w.webp). Какие форматы есть у картинки,
+записано в Post.image_formats: тег <picture> и post_image выбирают
+только из них.
+"""
+import os
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+EXTENSION = 'jpg'
+# Форматы в порядке предпочтения: расширение, имя в Pillow, MIME-тип.
+MODERN_FORMATS = (
+    ('avif', 'AVIF', 'image/avif'),
+    ('webp', 'WEBP', 'image/webp'),
+)
+FORMATS = {
+    EXTENSION: ('JPEG', 'image/jpeg'),
+    **{extension: (format, content_type)
+       for extension, format, content_type in MODERN_FORMATS},
+}
+# Тег EXIF Orientation и его значения с поворотом на 90 градусов.
+ORIENTATION = 0x0112
+ROTATED = (5, 6, 7, 8)
+
+
+def supported_formats():
+    """Современные форматы, которые может записать установленный Pillow."""
+    Image.init()
+    return [extension for extension, format, _ in MODERN_FORMATS
+            if format in Image.SAVE]
+
+
+def _encode(image, extension=EXTENSION):
+    buffer = BytesIO()
+    format = FORMATS[extension][0]
+    options = {'quality': settings.POST_IMAGE_QUALITY}
+    if format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    elif format == 'WEBP':
+        options.update(method=5)
+    # Метаданные (EXIF с геопозицией и т. п.) не передаются в save(),
+    # поэтому в новый файл не попадают; цветовой профиль сохраняется.
+    image.save(
+        buffer,
+        format,
+        icc_profile=image.info.get('icc_profile'),
+        **options,
+    )
+    return buffer.getvalue()
+
+
+def _to_rgb(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def normalize(upload):
+    """Проверить и пересохранить загруженную картинку.
+
+    Возвращает ContentFile с именем *.jpg; размеры лежат в атрибутах
+    width и height. Для слишком тяжёлых и битых файлов бросает
+    ValidationError.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            params={'limit': settings.POST_IMAGE_MAX_BYTES // 2 ** 20},
+        )
+    upload.seek(0)
+    try:
+        # open() читает только заголовок: размеры известны до того, как
+        # картинка будет развёрнута в памяти.
+        image = Image.open(upload)
+        if image.width * image.height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError('Слишком большое разрешение картинки.')
+        max_size = settings.POST_IMAGE_MAX_SIZE
+        # JPEG декодируется сразу в уменьшенном масштабе.
+        image.draft('RGB', (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+        image = _to_rgb(image)
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать картинку.')
+
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    content = ContentFile(_encode(image), name=f'{stem}.{EXTENSION}')
+    content.width, content.height = image.size
+    return content
+
+
+def variant_name(name, width=None, extension=EXTENSION):
+    """Имя копии картинки; без width — копия полного размера.
+
+    Каталог копий назван по имени файла в хранилище, а имена в нём
+    хранилище уникальны: копии одной картинки не совпадут с другой
+    картинкой или её копиями.
+    """
+    directory, filename = posixpath.split(name)
+    size = f'{width}w' if width else 'full'
+    return posixpath.join(
+        directory, 'variants', filename, f'{size}.{extension}'
+    )
+
+
+def variant_widths(image_width):
+    """Ширины копий, которые меньше самой картинки."""
+    return [width for width in settings.POST_IMAGE_WIDTHS
+            if width < image_width]
+
+
+def _write(name, data):
+    # Файл мог остаться от удалённой картинки с тем же именем: save()
+    # не перезаписывает, а выбрал бы другое имя.
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(data))
+
+
+def save_variants(name):
+    """Сохранить уменьшенные копии и копии в современных форматах.
+
+    Копии пишутся заново каждый раз. Возвращает ширину, высоту
+    картинки и список современных форматов, в которых она сохранена.
+    """
+    formats = supported_formats()
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        size = image.size
+        if image.getexif().get(ORIENTATION) in ROTATED:
+            size = size[::-1]
+        image = _to_rgb(ImageOps.exif_transpose(image))
+    for width in [size[0], *sorted(variant_widths(size[0]), reverse=True)]:
+        if width != size[0]:
+            height = max(1, round(size[1] * width / size[0]))
+            image = image.resize((width, height), Image.LANCZOS)
+        for extension in [EXTENSION, *formats]:
+            if width == size[0] and extension == EXTENSION:
+                # Полноразмерный JPEG — это сама картинка.
+                continue
+            _write(
+                variant_name(name, None if width == size[0] else width,
+                             extension),
+                _encode(image, extension),
+            )
+    return (*size, formats)
+
+
+def formats_of(post):
+    """Форматы картинки поста, лучшие первыми; JPEG есть всегда."""
+    stored = set(post.image_formats.split(',')) if post.image_formats else ()
+    return [extension for extension, _, _ in MODERN_FORMATS
+            if extension in stored] + [EXTENSION]
+
+
+def url(post, width=None, extension=EXTENSION):
+    if width is None and extension == EXTENSION:
+        return post.image.url
+    return default_storage.url(
+        variant_name(post.image.name, width, extension)
+    )
+
+
+def srcset(post, extension=EXTENSION):
+    """Значение srcset для картинки поста с известной шириной."""
+    candidates = [
+        (url(post, width, extension), width)
+        for width in variant_widths(post.image_width)
+    ]
+    candidates.append((url(post, None, extension), post.image_width))
+    return ', '.join(f'{url} {width}w' for url, width in candidates)
+
+
+def sources(post):
+    """Источники для <picture>: MIME-тип и srcset каждого формата."""
+    return [
+        {'type': FORMATS[extension][1], 'srcset': srcset(post, extension)}
+        for extension in formats_of(post)[:-1]
+    ]
+
+
+def accepted(accept, content_type):
+    """Есть ли content_type в заголовке Accept с ненулевым q."""
+    for item in accept.split(','):
+        media_type, *params = [part.strip() for part in item.split(';')]
+        if media_type != content_type:
+            continue
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def best_url(post, accept, width=None):
+    """Адрес копии, лучшей для клиента с заголовком Accept.
+
+    Берётся самая узкая копия не уже width (по умолчанию полный размер)
+    в лучшем из форматов, которые принимает клиент.
+    """
+    extension = next(
+        extension for extension in formats_of(post)
+        if extension == EXTENSION
+        or accepted(accept, FORMATS[extension][1])
+    )
+    variant = None
+    if width:
+        variant = next(
+            (candidate for candidate in variant_widths(post.image_width)
+             if candidate >= width),
+            None,
+        )
+    return url(post, variant, extension)
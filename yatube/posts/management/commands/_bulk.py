@@ -0,0 +1,61 @@
+"""Общие помощники команд массовой загрузки данных."""
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import connections
+
+
+def batched(iterable, size):
+    """Разбить итерируемое на списки по size элементов."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def keep_auto_dates(model, *names):
+    """Не подменять даты auto_now/auto_now_add при bulk_create.
+
+    Нужно, чтобы загруженные записи сохранили свои даты публикации.
+    """
+    fields = [model._meta.get_field(name) for name in names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def insert_rows(model, names, rows, using='default'):
+    """Вставить готовые значения столбцов одним executemany.
+
+    Быстрее bulk_create: модели не создаются, значения не готовятся
+    полями. Поэтому rows должны быть уже в виде для базы (даты — через
+    adapt_datetime). Конфликты по уникальным ключам пропускаются;
+    вернуть число действительно вставленных строк.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(model._meta.get_field(name).column) for name in names
+    )
+    placeholders = ', '.join(['%s'] * len(names))
+    sql = (
+        f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+        f'{quote(model._meta.db_table)} ({columns}) '
+        f'VALUES ({placeholders})'
+        f'{connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+        return cursor.rowcount
+
+
+def adapt_datetime(value, using='default'):
+    return connections[using].ops.adapt_datetimefield_value(value)
@@ -0,0 +1,274 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from core.paginator import NEXT, CursorPaginator
+from posts import counters, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+from ._bulk import batched, keep_auto_dates
+
+PERCENTILES = (50, 95, 99)
+TEXT_POOL_SIZE = 1000
+# Сколько id постов проверять одним запросом.
+SAMPLE_SIZE = 500
+
+
+def random_post_ids(count):
+    """count случайных id существующих постов.
+
+    Все id в память не загружаются: кандидаты из промежутка [min, max]
+    проверяются пачками, а попавшие в дыры отбрасываются.
+    """
+    bounds = Post.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    while count > 0:
+        candidates = [
+            random.randint(bounds['low'], bounds['high'])
+            for _ in range(min(count, SAMPLE_SIZE))
+        ]
+        existing = set(
+            Post.objects.filter(pk__in=candidates)
+            .values_list('pk', flat=True)
+        )
+        for pk in candidates:
+            if pk in existing:
+                count -= 1
+                yield pk
+
+
+def percentile(values, rank):
+    ordered = sorted(values)
+    index = round(rank / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу тестовыми данными и замеряет задержку и число '
+        'SQL-запросов страниц posts'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-seed',
+            action='store_true',
+            help='Не добавлять данные, замерить на имеющихся',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Сколько раз запрашивать каждую страницу',
+        )
+        parser.add_argument(
+            '--depth',
+            type=int,
+            default=1000,
+            help='Глубина (в постах) для замеров глубоких страниц',
+        )
+        parser.add_argument(
+            '--warm',
+            action='store_true',
+            help='Не очищать кэш перед каждым запросом',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='benchmark.json')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        Faker.seed(options['seed'])
+        if not options['no_seed']:
+            self.seed(options)
+        results = self.measure(options)
+        report = {
+            'created': timezone.now().isoformat(),
+            'options': options,
+            'data': {
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2,
+                      default=str)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<28} p50={result["p50_ms"]:8.2f} мс '
+                f'p95={result["p95_ms"]:8.2f} мс '
+                f'p99={result["p99_ms"]:8.2f} мс '
+                f'запросов={result["queries"]}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'
+        ))
+
+    def seed(self, options):
+        fake = Faker('ru_RU')
+        texts = [fake.paragraph(nb_sentences=4)
+                 for _ in range(TEXT_POOL_SIZE)]
+        batch_size = options['batch_size']
+        now = timezone.now()
+
+        def random_date():
+            return now - timedelta(seconds=random.randint(0, 365 * 86400))
+
+        run = int(time.time())
+        password = make_password('benchmark')
+        self.stdout.write('Пользователи…')
+        self.bulk(User, (
+            User(username=f'bench{run}_{number}', password=password,
+                 first_name=fake.first_name(), last_name=fake.last_name())
+            for number in range(options['users'])
+        ), batch_size)
+        user_ids = list(User.objects.values_list('pk', flat=True))
+
+        self.stdout.write('Группы…')
+        mixer = Mixer(commit=False)
+        self.bulk(Group, (
+            mixer.blend(Group, slug=f'bench{run}-{number}')
+            for number in range(options['groups'])
+        ), batch_size)
+        group_ids = list(Group.objects.values_list('pk', flat=True)) + [None]
+
+        self.stdout.write('Посты…')
+        with keep_auto_dates(Post, 'pub_date', 'updated'):
+            def posts():
+                for _ in range(options['posts']):
+                    date = random_date()
+                    yield Post(
+                        author_id=random.choice(user_ids),
+                        group_id=random.choice(group_ids),
+                        text=random.choice(texts),
+                        pub_date=date,
+                        updated=date,
+                    )
+            self.bulk(Post, posts(), batch_size)
+
+        self.stdout.write('Комментарии…')
+        with keep_auto_dates(Comment, 'created'):
+            self.bulk(Comment, (
+                Comment(
+                    post_id=post_id,
+                    author_id=random.choice(user_ids),
+                    text=random.choice(texts)[:200],
+                    created=random_date(),
+                )
+                for post_id in random_post_ids(options['comments'])
+            ), batch_size)
+
+        self.stdout.write('Подписки…')
+        # Повторы и уже существующие подписки отбрасывает уникальный
+        # индекс через ignore_conflicts.
+        if len(user_ids) > 1:
+            self.bulk(Follow, (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in (
+                    random.sample(user_ids, 2)
+                    for _ in range(options['follows'])
+                )
+            ), batch_size)
+
+        self.stdout.write('Счётчики и ленты…')
+        counters.recount()
+        timeline.rebuild()
+        cache.clear()
+
+    def bulk(self, model, objects, batch_size):
+        for batch in batched(objects, batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def measure(self, options):
+        reader_id = (
+            Follow.objects.values_list('user_id', flat=True).first()
+            or User.objects.values_list('pk', flat=True).first()
+        )
+        reader = User.objects.get(pk=reader_id)
+        author = User.objects.filter(
+            counters__posts_count__gt=0
+        ).order_by('-counters__posts_count').first() or reader
+        group = Group.objects.order_by('-posts_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+
+        client = Client()
+        client.force_login(reader)
+        depth = options['depth']
+        page = depth // settings.MAX_NUMBER_POST + 1
+        feeds = {
+            'index': (reverse('posts:index'), Post.objects.all()),
+            'follow_index': (
+                reverse('posts:follow_index'), timeline.feed_for(reader)
+            ),
+            'profile': (
+                reverse('posts:profile', args=[author.username]),
+                author.posts.all(),
+            ),
+        }
+        if group is not None:
+            feeds['group_posts'] = (
+                reverse('posts:group_list', args=[group.slug]),
+                group.posts.all(),
+            )
+
+        targets = {}
+        for name, (url, posts) in feeds.items():
+            targets[name] = url
+            targets[f'{name} ?page={page}'] = f'{url}?page={page}'
+            paginator = CursorPaginator(posts, settings.MAX_NUMBER_POST)
+            deep = paginator.object_list[depth:depth + 1].first()
+            if deep is not None:
+                cursor = paginator.encode_cursor(NEXT, deep)
+                targets[f'{name} cursor@{depth}'] = f'{url}?cursor={cursor}'
+        if post is not None:
+            targets['post_detail'] = reverse(
+                'posts:post_detail', args=[post.pk]
+            )
+
+        return {
+            name: self.measure_url(client, url, options)
+            for name, url in targets.items()
+        }
+
+    def measure_url(self, client, url, options):
+        timings = []
+        queries = []
+        status = None
+        for _ in range(options['requests']):
+            if not options['warm']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            status = response.status_code
+        result = {'url': url, 'status': status, 'queries': max(queries)}
+        for rank in PERCENTILES:
+            result[f'p{rank}_ms'] = round(percentile(timings, rank), 3)
+        return result
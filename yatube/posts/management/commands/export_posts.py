@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.forms import ExportForm
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты или комментарии в CSV или JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', choices=['posts', 'comments'], default='posts'
+        )
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'], default='csv'
+        )
+        parser.add_argument('--from', dest='date_from', help='ГГГГ-ММ-ДД')
+        parser.add_argument('--to', dest='date_to', help='ГГГГ-ММ-ДД')
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз',
+        )
+        parser.add_argument(
+            '--output', default='-', help='Файл; по умолчанию stdout'
+        )
+
+    def handle(self, *args, **options):
+        form = ExportForm({
+            name: options[name]
+            for name in ('kind', 'format', 'date_from', 'date_to', 'group')
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        lines = export.lines(
+            chunk_size=options['chunk_size'], **form.cleaned_data
+        )
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='',
+                  encoding='utf-8') as output:
+            output.writelines(lines)
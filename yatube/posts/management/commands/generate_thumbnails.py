@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate_safely
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры картинок всех постов в нескольких процессах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Число процессов; 1 — строить в текущем процессе',
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        if options['workers'] > 1:
+            # Соединения с базой не должны переходить в дочерние процессы.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                initializer=django.setup,
+            ) as executor:
+                errors = list(executor.map(generate_safely, names,
+                                           chunksize=50))
+        else:
+            errors = [generate_safely(name) for name in names]
+
+        failed = sum(error is not None for error in errors)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(names)}, с ошибками: {failed}'
+        ))
@@ -0,0 +1,306 @@
+import csv
+import json
+import os
+from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from posts import counters, search, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+from ._bulk import adapt_datetime, batched, insert_rows
+
+# Порядок вставки внутри пачки: сначала те, на кого ссылаются.
+TYPES = ('user', 'group', 'post', 'comment', 'follow')
+# orjson — необязательная зависимость: разбирает строки втрое быстрее.
+loads = orjson.loads if orjson is not None else json.loads
+# Сколько id проверять одним запросом при поиске совпадений.
+CHECK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пользователей, группы, посты, комментарии и подписки '
+        'из JSON Lines или CSV пачками через bulk_create'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv')
+        parser.add_argument('--format', choices=['jsonl', 'csv'])
+        parser.add_argument(
+            '--type',
+            choices=TYPES,
+            help='Тип записей, у которых нет поля type',
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--images',
+            help='Каталог с картинками, на которые ссылается поле image',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с числом загруженных записей; '
+                 'по умолчанию <path>.checkpoint',
+        )
+        parser.add_argument(
+            '--no-rebuild',
+            action='store_true',
+            help='Не пересчитывать счётчики и ленты после загрузки',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        self.images = options['images']
+        self.default_type = options['type']
+        self.checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        self.now = timezone.now()
+        self.unusable_password = make_password(None)
+        self.dates = {}
+        self.saved_images = {}
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+
+        done = self.read_checkpoint()
+        if done:
+            self.stdout.write(f'Продолжаем после записи {done}')
+        records = islice(self.read(path, options['format']), done, None)
+        indexed = search.is_available()
+        if indexed:
+            # Индекс дешевле перестроить целиком, чем обновлять
+            # триггером на каждой вставке; больший кэш страниц ускоряет
+            # вставку в индексы таблиц.
+            search.drop_triggers()
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size = -262144')
+        try:
+            for batch in batched(records, options['batch_size']):
+                with transaction.atomic():
+                    self.load(batch)
+                done += len(batch)
+                self.write_checkpoint(done)
+                self.stdout.write(f'Загружено записей: {done}')
+        finally:
+            # Без триггеров новые посты сайта не попадут в поиск,
+            # поэтому индекс возвращается и после сбоя.
+            if indexed:
+                self.stdout.write('Перестройка поискового индекса…')
+                search.ensure_index()
+        if not options['no_rebuild']:
+            self.stdout.write('Пересчёт счётчиков и лент…')
+            counters.recount()
+            timeline.rebuild()
+            cache.clear()
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        self.stdout.write(self.style.SUCCESS(f'Готово, записей: {done}'))
+
+    def read(self, path, format):
+        format = format or os.path.splitext(path)[1].lstrip('.')
+        with open(path, newline='', encoding='utf-8') as source:
+            if format == 'jsonl':
+                for line in source:
+                    if line.strip():
+                        yield loads(line)
+            elif format == 'csv':
+                yield from csv.DictReader(source)
+            else:
+                raise CommandError('Поддерживаются только .jsonl и .csv')
+
+    def read_checkpoint(self):
+        if not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint) as checkpoint:
+            return int(checkpoint.read() or 0)
+
+    def write_checkpoint(self, done):
+        with open(f'{self.checkpoint}.tmp', 'w') as checkpoint:
+            checkpoint.write(str(done))
+        os.replace(f'{self.checkpoint}.tmp', self.checkpoint)
+
+    def load(self, batch):
+        by_type = defaultdict(list)
+        for record in batch:
+            kind = record.get('type') or self.default_type
+            if kind not in TYPES:
+                raise CommandError(f'Неизвестный тип записи: {record}')
+            by_type[kind].append(record)
+        for kind in TYPES:
+            if by_type[kind]:
+                getattr(self, f'load_{kind}s')(by_type[kind])
+
+    def date(self, value):
+        if not value:
+            return self.now
+        date = parse_datetime(value)
+        if date is None:
+            raise CommandError(f'Неверная дата: {value}')
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date
+
+    def db_date(self, value):
+        """Дата в виде для базы; одинаковые строки разбираются один раз."""
+        if value not in self.dates:
+            self.dates[value] = adapt_datetime(self.date(value))
+        return self.dates[value]
+
+    def user_id(self, username):
+        try:
+            return self.users[username]
+        except KeyError:
+            raise CommandError(f'Нет пользователя {username}')
+
+    def load_users(self, records):
+        User.objects.bulk_create(
+            [
+                User(
+                    username=record['username'],
+                    first_name=record.get('first_name') or '',
+                    last_name=record.get('last_name') or '',
+                    email=record.get('email') or '',
+                    password=record.get('password') or self.unusable_password,
+                    date_joined=self.date(record.get('date_joined')),
+                )
+                for record in records
+            ],
+            ignore_conflicts=True,
+        )
+        self.users.update(User.objects.filter(
+            username__in=[record['username'] for record in records]
+        ).values_list('username', 'pk'))
+
+    def load_groups(self, records):
+        Group.objects.bulk_create(
+            [
+                Group(
+                    slug=record['slug'],
+                    title=record.get('title') or record['slug'],
+                    description=record.get('description') or '',
+                )
+                for record in records
+            ],
+            ignore_conflicts=True,
+        )
+        self.groups.update(Group.objects.filter(
+            slug__in=[record['slug'] for record in records]
+        ).values_list('slug', 'pk'))
+
+    def load_posts(self, records):
+        rows = []
+        for record in records:
+            date = self.db_date(record.get('pub_date'))
+            slug = record.get('group')
+            if slug and slug not in self.groups:
+                raise CommandError(f'Нет группы {slug}')
+            rows.append((
+                record.get('id') or None,
+                self.user_id(record['author']),
+                self.groups[slug] if slug else None,
+                record['text'],
+                date,
+                date,
+                self.image(record.get('image')),
+                '',
+                0,
+            ))
+        inserted = insert_rows(Post, (
+            'id', 'author', 'group', 'text', 'pub_date', 'updated', 'image',
+            'image_formats', 'comments_count',
+        ), rows)
+        if inserted < len(rows):
+            self.check_conflicts(Post, ('author', 'text'), [
+                (row[0], row[1], row[3]) for row in rows
+            ])
+
+    def load_comments(self, records):
+        rows = [
+            (
+                record.get('id') or None,
+                record['post'],
+                self.user_id(record['author']),
+                record['text'],
+                self.db_date(record.get('created')),
+            )
+            for record in records
+        ]
+        inserted = insert_rows(
+            Comment, ('id', 'post', 'author', 'text', 'created'), rows
+        )
+        if inserted < len(rows):
+            self.check_conflicts(Comment, ('post', 'author', 'text'), [
+                row[:4] for row in rows
+            ])
+
+    def check_conflicts(self, model, names, rows):
+        """Пропущенные строки с занятыми id должны быть теми же записями.
+
+        INSERT OR IGNORE молча пропускает строку, если id уже занят.
+        Для повтора пачки после сбоя это верно, но чужая запись с тем же
+        id означала бы потерю данных: комментарии пристали бы к другому
+        посту. rows — кортежи (id, *значения names).
+        """
+        fields = [model._meta.pk] + [
+            model._meta.get_field(name) for name in names
+        ]
+        # Из CSV приходят строки: приводим к тем же типам, что в базе.
+        expected = {}
+        for row in rows:
+            if row[0]:
+                pk, *values = (
+                    field.to_python(value)
+                    for field, value in zip(fields, row)
+                )
+                expected[pk] = tuple(values)
+        ids = list(expected)
+        taken = []
+        for start in range(0, len(ids), CHECK_SIZE):
+            existing = model.objects.filter(
+                pk__in=ids[start:start + CHECK_SIZE]
+            ).values_list(*(field.attname for field in fields))
+            taken.extend(
+                pk for pk, *values in existing if tuple(values) != expected[pk]
+            )
+        if taken:
+            raise CommandError(
+                f'{model._meta.verbose_name_plural}: id {sorted(taken)} '
+                'уже заняты другими записями. Загрузите данные без id '
+                'или в пустую базу.'
+            )
+
+    def load_follows(self, records):
+        insert_rows(Follow, ('user', 'author'), [
+            (self.user_id(record['user']), self.user_id(record['author']))
+            for record in records
+            if record['user'] != record['author']
+        ])
+
+    def image(self, name):
+        """Скопировать картинку в хранилище и вернуть её имя там.
+
+        Файл с тем же именем в хранилище может быть чужой картинкой,
+        поэтому копия сохраняется всегда, под свободным именем. Повторные
+        ссылки на тот же файл в одной загрузке получают ту же копию.
+        """
+        if not name:
+            return ''
+        if not self.images:
+            raise CommandError('Для картинок нужен параметр --images')
+        if name not in self.saved_images:
+            with open(os.path.join(self.images, name), 'rb') as image:
+                self.saved_images[name] = default_storage.save(
+                    f'posts/{os.path.basename(name)}', File(image)
+                )
+        return self.saved_images[name]
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Сколько постов индексировать за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stderr.write('Полнотекстовый индекс есть только в SQLite')
+            return
+        search.install()
+        indexed = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано постов: {indexed}')
+        )
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:42
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    duplicates = (
+        Follow.objects.values('user_id', 'author_id')
+        .annotate(keep=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in list(duplicates):
+        Follow.objects.filter(
+            user_id=row['user_id'], author_id=row['author_id'],
+        ).exclude(id=row['keep']).delete()
+        extra = row['total'] - 1
+        UserCounters.objects.filter(
+            user_id=row['author_id'], followers_count__gte=extra,
+        ).update(
+            followers_count=models.F('followers_count') - extra
+        )
+        UserCounters.objects.filter(
+            user_id=row['user_id'], following_count__gte=extra,
+        ).update(
+            following_count=models.F('following_count') - extra
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
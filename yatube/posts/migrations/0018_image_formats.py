@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_image_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_formats',
+            field=models.CharField(blank=True, editable=False, max_length=20, verbose_name='Форматы картинки'),
+        ),
+    ]
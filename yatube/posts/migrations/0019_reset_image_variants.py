@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def reset_variants(apps, schema_editor):
+    # Копии картинок переехали в posts/variants/<файл>/: старые имена
+    # забываются, пока generate_thumbnails не построит копии заново.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.exclude(image_width=None).update(
+        image_width=None, image_height=None, image_formats=''
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_image_formats'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_variants, migrations.RunPython.noop),
+    ]
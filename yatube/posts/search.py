@@ -0,0 +1,177 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс posts_post_fts хранит только токены (external content), текст
+берётся из posts_post. Триггеры держат индекс в актуальном состоянии при
+любой записи в таблицу постов, включая bulk_create и update().
+
+При пересоздании таблицы в миграциях SQLite удаляет её триггеры, поэтому
+индекс и триггеры создаются заново после каждого migrate (install()
+вызывается по сигналу post_migrate), а индекс при этом перестраивается.
+"""
+import base64
+import binascii
+import json
+import re
+
+from django.db import connections, transaction
+
+from posts.models import Post
+
+TABLE = 'posts_post_fts'
+
+TRIGGERS = {
+    f'{TABLE}_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLE}_insert
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text);
+        END
+    """,
+    f'{TABLE}_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLE}_delete
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {TABLE}({TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END
+    """,
+    f'{TABLE}_update': f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLE}_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {TABLE}({TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text);
+        END
+    """,
+}
+
+
+def is_available(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def install(using='default'):
+    """Создать индекс и триггеры, если их нет. Вернуть True, если
+    что-то пришлось создать."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name = %s "
+            "OR (type = 'trigger' AND tbl_name = 'posts_post')",
+            [TABLE],
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = ({TABLE} | set(TRIGGERS)) - existing
+        if not missing:
+            return False
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "text, content='posts_post', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+    return True
+
+
+def drop_triggers(using='default'):
+    """Отключить обновление индекса на время массовой загрузки.
+
+    Вернуть индекс в строй — ensure_index(): триггеры создадутся
+    заново, а индекс перестроится целиком.
+    """
+    with connections[using].cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def ensure_index(using='default', **kwargs):
+    """Обработчик post_migrate."""
+    if is_available(using) and install(using):
+        rebuild(using=using)
+
+
+def rebuild(batch_size=10000, using='default'):
+    """Перестроить индекс пачками по batch_size постов."""
+    connection = connections[using]
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('delete-all')")
+    last_id = 0
+    indexed = 0
+    while True:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT MAX(id), COUNT(*) FROM (SELECT id FROM posts_post "
+                "WHERE id > %s ORDER BY id LIMIT %s)",
+                [last_id, batch_size],
+            )
+            upper_id, count = cursor.fetchone()
+            if not count:
+                break
+            cursor.execute(
+                f"INSERT INTO {TABLE}(rowid, text) SELECT id, text "
+                "FROM posts_post WHERE id > %s AND id <= %s",
+                [last_id, upper_id],
+            )
+        last_id = upper_id
+        indexed += count
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def to_match(query):
+    """Запрос пользователя в выражение MATCH: слова по префиксу, через И."""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def match_sql(match):
+    return (
+        f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s",
+        [match],
+    )
+
+
+def encode_cursor(rank, pk):
+    data = json.dumps([rank, pk]).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        return None
+
+
+def search(query, cursor=None, limit=10):
+    """Найти посты по релевантности (bm25).
+
+    Возвращает список постов и курсор следующей страницы. Страницы
+    выбираются по ключу (rank, id), без OFFSET.
+    """
+    if not is_available():
+        posts = Post.objects.for_feed().filter(text__icontains=query)
+        return list(posts[:limit]), None
+    match = to_match(query)
+    if not match:
+        return [], None
+    sql = f"SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH %s"
+    params = [match]
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None:
+        sql += " AND (rank > %s OR (rank = %s AND rowid > %s))"
+        params += [after[0], after[0], after[1]]
+    sql += " ORDER BY rank, rowid LIMIT %s"
+    params.append(limit + 1)
+    with connections['default'].cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+    return [posts[pk] for pk, _ in rows if pk in posts], next_cursor
@@ -0,0 +1,110 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import cache, counters, timeline
+from posts.models import Comment, Follow, Post, User, UserCounters
+
+
+# Поля пользователя, которые видны в лентах и карточках постов.
+SHOWN_NAME = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_old_name(sender, instance, raw, update_fields, **kwargs):
+    instance._old_name = None
+    if (not raw and not instance._state.adding
+            and update_fields != frozenset(['last_login'])):
+        instance._old_name = (
+            User.objects.filter(pk=instance.pk)
+            .values_list(*SHOWN_NAME)
+            .first()
+        )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+    elif update_fields != frozenset(['last_login']):
+        counters.touch(instance.pk)
+        old_name = instance._old_name
+        name = tuple(getattr(instance, field) for field in SHOWN_NAME)
+        if old_name is not None and old_name != name:
+            cache.invalidate_author(
+                instance.pk, old_name[0], instance.username
+            )
+        else:
+            cache.bump(cache.profile_namespace(instance.username))
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_group(sender, instance, raw, **kwargs):
+    instance._old_group_id = None
+    if not raw and not instance._state.adding:
+        instance._old_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+        timeline.fan_out(instance)
+    elif instance._old_group_id != instance.group_id:
+        counters.change_group(instance._old_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+        counters.touch(instance.author_id)
+    else:
+        counters.touch(instance.author_id, instance.group_id)
+    cache.invalidate_post(
+        instance.author_id, instance.group_id, instance._old_group_id
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+    cache.invalidate_post(instance.author_id, instance.group_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 1)
+        counters.touch_post(instance.post_id)
+        cache.invalidate_comment(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+    counters.touch_post(instance.post_id)
+    cache.invalidate_comment(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        cache.invalidate_profiles(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    was_big = timeline.big_authors([instance.author_id])
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+    cache.invalidate_profiles(instance.user_id, instance.author_id)
+    timeline.remove(instance.user_id, instance.author_id)
+    timeline.refill_dropped(was_big)
@@ -0,0 +1,58 @@
+import zlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import images
+
+register = template.Library()
+
+
+def card_key(post, show_group):
+    stamp = int(post.updated.timestamp() * 1000000)
+    variant = 'g' if show_group else 'n'
+    # Имя автора лежит в другой таблице, и его правка не меняет
+    # post.updated: отпечаток имени входит в ключ отдельно.
+    author = zlib.crc32(post.author.get_full_name().encode())
+    return (
+        f'post-card:{post.pk}:{stamp}:{post.comments_count}:{variant}:'
+        f'{author:x}'
+    )
+
+
+@register.simple_tag
+def post_cards(posts, show_group=True):
+    """Карточки постов ленты из кэша фрагментов.
+
+    Все карточки страницы читаются одним cache.get_many, шаблон
+    рендерится только для промахов. Ключ включает дату изменения поста,
+    поэтому правка поста сама делает старую карточку ненужной.
+    """
+    posts = list(posts)
+    keys = [card_key(post, show_group) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            cards[key] = missing[key] = render_to_string(
+                'posts/includes/post_card.html',
+                {'post': post, 'show_group': show_group},
+            )
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+@register.simple_tag
+def image_srcset(post):
+    """srcset из уменьшенных копий картинки поста (posts.images)."""
+    return images.srcset(post)
+
+
+@register.simple_tag
+def image_sources(post):
+    """<source> для <picture>: WebP и AVIF-копии картинки поста."""
+    return images.sources(post)
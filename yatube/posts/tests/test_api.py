@@ -0,0 +1,111 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@override_settings(MAX_NUMBER_POST=2)
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(3)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def urls(self):
+        return [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.author.username]),
+            reverse('posts:api_follow_index'),
+        ]
+
+    def test_feeds(self):
+        """Ленты отдаются в JSON постранично по курсору"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                data = self.reader_client.get(url).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [self.posts[2].pk, self.posts[1].pk],
+                )
+                self.assertEqual(data['results'][0]['author'], 'author')
+                self.assertEqual(data['results'][0]['group'], 'group')
+                data = self.reader_client.get(
+                    url, {'cursor': data['next']}
+                ).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [self.posts[0].pk],
+                )
+
+    def test_follow_anonymous(self):
+        """Анониму лента подписок отвечает 401 в JSON, а не редиректом"""
+        response = self.client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', response.json())
+
+    def test_not_modified(self):
+        """Неизменившаяся лента отвечает 304 одним запросом к базе"""
+        for url in self.urls()[:3]:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.assertTrue(etag.startswith('"'))
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_follow_not_modified(self):
+        """Лента подписок тоже отвечает 304, пока не изменилась"""
+        url = reverse('posts:api_follow_index')
+        etag = self.reader_client.get(url)['ETag']
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_etag_changes_with_new_post(self):
+        """Новый пост меняет ETag ленты"""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_detail(self):
+        """Пост отдаётся с комментариями; новый комментарий меняет ETag"""
+        post = self.posts[0]
+        url = reverse('posts:api_post_detail', args=[post.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['post']['text'], post.text)
+        self.assertEqual(response.json()['comments']['results'], [])
+        Comment.objects.create(post=post, author=self.reader, text='Ура')
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['comments']['results'][0]['author'], 'reader'
+        )
@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.management.commands.benchmark_feeds import random_post_ids
+from posts.models import Follow, Post, TimelineEntry, User
+
+
+class BenchmarkFeedsTests(TestCase):
+    def test_seed_and_report(self):
+        """benchmark_feeds заполняет базу и пишет отчёт с перцентилями"""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_feeds',
+                users=5, groups=2, posts=40, comments=20, follows=8,
+                requests=2, depth=15, output=output, stdout=StringIO(),
+            )
+            with open(output) as report_file:
+                report = json.load(report_file)
+
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(report['data']['posts'], 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        results = report['results']
+        self.assertIn('index', results)
+        self.assertIn('index cursor@15', results)
+        self.assertIn('post_detail', results)
+        for result in results.values():
+            self.assertEqual(result['status'], 200)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_random_post_ids(self):
+        """Комментарии генерируются только к существующим постам"""
+        self.assertEqual(list(random_post_ids(5)), [])
+        author = User.objects.create_user(username='author')
+        posts = [Post.objects.create(author=author, text='Пост')
+                 for _ in range(10)]
+        for post in posts[1:-1:2]:
+            post.delete()
+        existing = set(Post.objects.values_list('pk', flat=True))
+        post_ids = list(random_post_ids(50))
+        self.assertEqual(len(post_ids), 50)
+        self.assertLessEqual(set(post_ids), existing)
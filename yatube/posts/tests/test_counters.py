@@ -0,0 +1,111 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other',
+            description='Описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        """Счётчики постов и комментариев следуют за записью и удалением"""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        comment = Comment.objects.create(
+            author=self.reader, post=post, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_follow_counters(self):
+        """Счётчики подписчиков и подписок следуют за подписками"""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_recount_command(self):
+        """Команда recount_counters исправляет расхождения"""
+        Post.objects.create(author=self.author, group=self.group, text='Пост')
+        UserCounters.objects.update(posts_count=42)
+        Group.objects.update(posts_count=42)
+        call_command('recount_counters', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+
+    def test_recount_keeps_correct_rows(self):
+        """Пересчёт не трогает updated у строк с верными счётчиками"""
+        correct = Post.objects.create(author=self.author, text='Пост')
+        wrong = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.filter(pk=wrong.pk).update(comments_count=5)
+        stamps = dict(Post.objects.values_list('pk', 'updated'))
+        call_command('recount_counters', stdout=StringIO())
+        correct.refresh_from_db()
+        wrong.refresh_from_db()
+        self.assertEqual(correct.updated, stamps[correct.pk])
+        self.assertNotEqual(wrong.updated, stamps[wrong.pk])
+        self.assertEqual(wrong.comments_count, 0)
+
+    def test_pages_without_aggregates(self):
+        """Профиль и страница поста не выполняют COUNT(*)"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        urls = (
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertContains(response, 'Всего постов')
+                sql = ' '.join(query['sql'] for query in queries)
+                self.assertNotIn('COUNT(', sql)
@@ -0,0 +1,77 @@
+import csv
+import datetime as dt
+import io
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Group, Post, User
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост, "в кавычках"'
+        )
+        cls.other = Post.objects.create(author=cls.author, text='Другой')
+        Post.objects.filter(pk=cls.other.pk).update(
+            pub_date=timezone.now() - dt.timedelta(days=30)
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий'
+        )
+
+    def test_command_csv(self):
+        """Команда выгружает посты в CSV с числом комментариев"""
+        out = StringIO()
+        call_command('export_posts', stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([row['id'] for row in rows],
+                         [str(self.post.pk), str(self.other.pk)])
+        self.assertEqual(rows[0]['text'], self.post.text)
+        self.assertEqual(rows[0]['group'], 'group')
+        self.assertEqual(rows[0]['comments_count'], '1')
+
+    def test_command_filters(self):
+        """Выгрузку можно ограничить датами и группой"""
+        today = timezone.now().date().isoformat()
+        for options in ({'date_from': today}, {'group': 'group'}):
+            with self.subTest(options=options):
+                out = StringIO()
+                call_command('export_posts', format='jsonl', stdout=out,
+                             **options)
+                rows = [json.loads(line)
+                        for line in out.getvalue().splitlines()]
+                self.assertEqual([row['id'] for row in rows],
+                                 [self.post.pk])
+
+    def test_view_streams_for_staff_only(self):
+        """Выгрузка по ссылке доступна только персоналу и идёт потоком"""
+        url = reverse('posts:export')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            url, {'kind': 'comments', 'format': 'jsonl'}
+        )
+        self.assertTrue(response.streaming)
+        self.assertIn('comments.jsonl', response['Content-Disposition'])
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows[0]['post'], self.post.pk)
+        self.assertEqual(rows[0]['group'], 'group')
+
+    def test_view_rejects_bad_filters(self):
+        """Неверные параметры выгрузки дают 400"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('posts:export'),
+                                   {'group': 'missing'})
+        self.assertEqual(response.status_code, 400)
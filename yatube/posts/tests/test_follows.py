@@ -0,0 +1,96 @@
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts import follows
+from posts.models import Follow, Post, TimelineEntry, User, UserCounters
+
+
+class FollowManyTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        cls.readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)
+        ]
+        cls.posts = [
+            Post.objects.create(author=author, text='Пост')
+            for author in cls.authors
+        ]
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def pairs(self):
+        return [
+            (reader.pk, author.pk)
+            for reader in self.readers for author in self.authors
+        ]
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора невозможна"""
+        Follow.objects.create(user=self.readers[0], author=self.authors[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(
+                user=self.readers[0], author=self.authors[0]
+            )
+
+    def test_follow_many(self):
+        """Массовая подписка пропускает дубли и обновляет счётчики и ленты"""
+        Follow.objects.create(user=self.readers[0], author=self.authors[0])
+        pairs = self.pairs() + [(self.readers[0].pk, self.readers[0].pk)]
+        with CaptureQueriesContext(connection) as queries:
+            follows.follow_many(pairs)
+        inserts = [query for query in queries
+                   if query['sql'].startswith('INSERT')
+                   and 'INTO "posts_follow"' in query['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Follow.objects.count(), 9)
+        self.assertEqual(self.counters(self.authors[0]).followers_count, 3)
+        self.assertEqual(self.counters(self.readers[0]).following_count, 3)
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.readers[1]
+            ).values_list('post_id', flat=True)),
+            {post.pk for post in self.posts},
+        )
+
+    def test_rebuild_reads_only_followed_authors(self):
+        """Ленты перестраиваются по индексу постов нужных авторов"""
+        with CaptureQueriesContext(connection) as queries:
+            follows.follow_many([(self.readers[0].pk, self.authors[0].pk)])
+        insert = next(query['sql'] for query in queries
+                      if query['sql'].lstrip().startswith('INSERT')
+                      and 'posts_timelineentry' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {insert}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertFalse(
+            any(step.startswith('SCAN posts_post') for step in plan), plan
+        )
+
+    def test_unfollow_many(self):
+        """Массовая отписка удаляет связи одним запросом"""
+        follows.follow_many(self.pairs())
+        with CaptureQueriesContext(connection) as queries:
+            deleted = follows.unfollow_many(
+                Follow.objects.filter(author__in=self.authors[:2])
+            )
+        deletes = [query for query in queries
+                   if query['sql'].startswith('DELETE FROM "posts_follow"')]
+        self.assertEqual(deleted, 6)
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(Follow.objects.count(), 3)
+        self.assertEqual(self.counters(self.authors[0]).followers_count, 0)
+        self.assertEqual(self.counters(self.readers[0]).following_count, 1)
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.readers[0]
+            ).values_list('post_id', flat=True)),
+            [self.posts[2].pk],
+        )
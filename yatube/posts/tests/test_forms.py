@@ -4,6 +4,7 @@ from http import HTTPStatus
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
@@ -174,9 +175,10 @@ class FollowFormTest(TestCase):
             user=self.user,
             author=self.post.author
         )
-        Follow.objects.create(
-            user=self.user,
-            author=self.post.author
-        ).delete()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(
+                user=self.user,
+                author=self.post.author
+            )
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), 1)
@@ -0,0 +1,257 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.models import Job
+from posts import images, thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_bytes(size, format='JPEG', mode='RGB', **options):
+    buffer = BytesIO()
+    Image.new(mode, size, color='red').save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+def with_exif(size):
+    exif = Image.Exif()
+    # Orientation: повернуть на 90 градусов; Make: производитель камеры.
+    exif[0x0112] = 6
+    exif[0x010F] = 'Camera'
+    return image_bytes(size, exif=exif.tobytes())
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_MAX_SIZE=800,
+    POST_IMAGE_WIDTHS=(320, 640),
+)
+class ImagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_normalize(self):
+        """Картинка поворачивается, уменьшается и теряет EXIF"""
+        upload = SimpleUploadedFile('photo.jpeg', with_exif((1600, 1000)))
+        content = images.normalize(upload)
+        self.assertEqual(content.name, 'photo.jpg')
+        self.assertEqual((content.width, content.height), (500, 800))
+        image = Image.open(BytesIO(content.read()))
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (500, 800))
+        self.assertFalse(image.getexif())
+
+    def test_normalize_transparent(self):
+        """PNG с прозрачностью пересохраняется в JPEG"""
+        upload = SimpleUploadedFile(
+            'logo.png', image_bytes((40, 20), 'PNG', 'RGBA')
+        )
+        content = images.normalize(upload)
+        self.assertEqual(content.name, 'logo.jpg')
+        self.assertEqual(Image.open(BytesIO(content.read())).mode, 'RGB')
+
+    def test_normalize_rejects(self):
+        """Битые, тяжёлые и огромные картинки не проходят проверку"""
+        uploads = {
+            'broken': SimpleUploadedFile('broken.jpg', b'not an image'),
+            'heavy': SimpleUploadedFile('heavy.jpg', b'x' * 10001),
+            'huge': SimpleUploadedFile('huge.png',
+                                       image_bytes((101, 100), 'PNG')),
+        }
+        with self.settings(POST_IMAGE_MAX_BYTES=10000,
+                           POST_IMAGE_MAX_PIXELS=10000):
+            for name, upload in uploads.items():
+                with self.subTest(name=name):
+                    with self.assertRaises(ValidationError):
+                        images.normalize(upload)
+
+    def test_create_post(self):
+        """Пост сохраняет обработанную картинку, а копии и размеры — задача"""
+        self.authorized_client.post(reverse('posts:post_create'), {
+            'text': 'Пост с фото',
+            'image': SimpleUploadedFile('cat.png',
+                                        image_bytes((1000, 500), 'PNG')),
+        })
+        post = Post.objects.get(text='Пост с фото')
+        self.assertEqual(post.image.name, 'posts/cat.jpg')
+        # Копии ещё не записаны: размеры появятся после задачи.
+        self.assertIsNone(post.image_width)
+        call_command('runworker', once=True, workers=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (800, 400))
+        for width in (320, 640):
+            name = images.variant_name(post.image.name, width)
+            with default_storage.open(name) as variant:
+                self.assertEqual(Image.open(variant).width, width)
+
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(
+            response,
+            'srcset="/media/posts/variants/cat.jpg/320w.jpg 320w, '
+            '/media/posts/variants/cat.jpg/640w.jpg 640w, '
+            '/media/posts/cat.jpg 800w"',
+        )
+
+    def test_failed_variants_not_recorded(self):
+        """Если копии не записались, пост не ссылается на них"""
+        self.authorized_client.post(reverse('posts:post_create'), {
+            'text': 'Пост с фото',
+            'image': SimpleUploadedFile('fox.png',
+                                        image_bytes((700, 300), 'PNG')),
+        })
+        post = Post.objects.get(text='Пост с фото')
+        with mock.patch('posts.images.save_variants', side_effect=OSError):
+            call_command('runworker', once=True, workers=1,
+                         stdout=StringIO())
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_formats, '')
+        self.assertTrue(Job.objects.filter(status=Job.QUEUED).exists())
+
+    def test_generate_backfills_variants(self):
+        """Миниатюры достраивают копии для старых картинок"""
+        name = default_storage.save(
+            'posts/old.jpg', ContentFile(image_bytes((700, 300)))
+        )
+        post = Post.objects.create(author=self.user, text='Старый',
+                                   image=name)
+        updated = post.updated
+        thumbnails.generate(name)
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (700, 300))
+        # Иначе страница поста с <picture> отвечала бы 304.
+        self.assertGreater(post.updated, updated)
+        self.assertTrue(default_storage.exists(
+            images.variant_name(name, 640)
+        ))
+        self.assertFalse(default_storage.exists(
+            images.variant_name(name, 960)
+        ))
+
+    def test_modern_formats_recorded(self):
+        """Пост помнит, в каких форматах сохранены копии картинки"""
+        self.authorized_client.post(reverse('posts:post_create'), {
+            'text': 'Пост с фото',
+            'image': SimpleUploadedFile('dog.png',
+                                        image_bytes((700, 300), 'PNG')),
+        })
+        call_command('runworker', once=True, workers=1, stdout=StringIO())
+        post = Post.objects.get(text='Пост с фото')
+        formats = images.supported_formats()
+        self.assertEqual(post.image_formats, ','.join(formats))
+        for extension in formats:
+            for width in (320, 640, None):
+                name = images.variant_name(post.image.name, width, extension)
+                self.assertTrue(default_storage.exists(name))
+
+    def test_variants_not_shared(self):
+        """Копии не берутся из чужих файлов с похожим именем"""
+        for name in ('posts/lion_320w.jpg',
+                     'posts/variants/lion.jpg/320w.jpg'):
+            default_storage.save(name, ContentFile(image_bytes((50, 50))))
+        name = default_storage.save(
+            'posts/lion.jpg', ContentFile(image_bytes((700, 300)))
+        )
+        images.save_variants(name)
+        variant = images.variant_name(name, 320)
+        self.assertEqual(variant, 'posts/variants/lion.jpg/320w.jpg')
+        with default_storage.open(variant) as file:
+            self.assertEqual(Image.open(file).size, (320, 137))
+
+    @skipUnless(images.supported_formats(), 'Pillow без WebP и AVIF')
+    def test_modern_variants_encoded(self):
+        """Копии в современных форматах открываются как картинки"""
+        name = default_storage.save(
+            'posts/modern.jpg', ContentFile(image_bytes((700, 300)))
+        )
+        images.save_variants(name)
+        for extension in images.supported_formats():
+            variant = images.variant_name(name, 320, extension)
+            with default_storage.open(variant) as file:
+                image = Image.open(file)
+                self.assertEqual(image.format, images.FORMATS[extension][0])
+                self.assertEqual(image.width, 320)
+
+    def create_processed_post(self, formats):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image='posts/pic.jpg',
+            image_width=800,
+            image_height=400,
+            image_formats=formats,
+        )
+
+    def test_picture_sources(self):
+        """Страница поста отдаёт <picture> с WebP и AVIF перед JPEG"""
+        post = self.create_processed_post('webp,avif')
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        content = response.content.decode()
+        avif = content.index(
+            '<source type="image/avif" srcset='
+            '"/media/posts/variants/pic.jpg/320w.avif 320w, '
+            '/media/posts/variants/pic.jpg/640w.avif 640w, '
+            '/media/posts/variants/pic.jpg/full.avif 800w"'
+        )
+        webp = content.index('<source type="image/webp"')
+        self.assertLess(avif, webp)
+        self.assertLess(webp, content.index('<img class="card-img'))
+
+    def test_post_image_negotiation(self):
+        """post_image выбирает формат по Accept и ширину по w"""
+        post = self.create_processed_post('webp,avif')
+        url = reverse('posts:post_image', kwargs={'post_id': post.pk})
+        variants = '/media/posts/variants/pic.jpg/'
+        cases = (
+            ('image/avif,image/webp,*/*', '', variants + 'full.avif'),
+            ('image/avif;q=0, image/webp', '', variants + 'full.webp'),
+            ('image/webp,*/*;q=0.8', '?w=500', variants + '640w.webp'),
+            ('*/*', '?w=100', variants + '320w.jpg'),
+            ('', '?w=5000', '/media/posts/pic.jpg'),
+            ('', '?w=²', '/media/posts/pic.jpg'),
+            ('', '?w=-1', '/media/posts/pic.jpg'),
+        )
+        for accept, query, expected in cases:
+            with self.subTest(accept=accept, query=query):
+                response = self.client.get(url + query, HTTP_ACCEPT=accept)
+                self.assertRedirects(response, expected,
+                                     fetch_redirect_response=False)
+                self.assertIn('Accept', response['Vary'])
+
+    def test_post_image_without_formats(self):
+        """Без современных копий post_image отдаёт JPEG"""
+        post = self.create_processed_post('')
+        response = self.client.get(
+            reverse('posts:post_image', kwargs={'post_id': post.pk}),
+            HTTP_ACCEPT='image/avif,image/webp',
+        )
+        self.assertRedirects(response, '/media/posts/pic.jpg',
+                             fetch_redirect_response=False)
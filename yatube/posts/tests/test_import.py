@@ -0,0 +1,163 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from posts import search
+from posts.models import (
+    Comment, Follow, Post, TimelineEntry, User, UserCounters
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+RECORDS = [
+    {'type': 'user', 'username': 'author'},
+    {'type': 'user', 'username': 'reader'},
+    {'type': 'group', 'slug': 'group', 'title': 'Группа'},
+    {'type': 'post', 'id': 100, 'author': 'author', 'group': 'group',
+     'text': 'Перенесённый пост', 'pub_date': '2020-01-02T03:04:05',
+     'image': 'small.gif'},
+    {'type': 'comment', 'post': 100, 'author': 'reader',
+     'text': 'Комментарий', 'created': '2020-01-03T00:00:00'},
+    {'type': 'follow', 'user': 'reader', 'author': 'author'},
+]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportContentTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, 'small.gif'), 'wb') as image:
+            image.write(SMALL_GIF)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, records):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as source:
+            for record in records:
+                source.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def load(self, path, **options):
+        call_command('import_content', path, images=self.directory,
+                     stdout=StringIO(), **options)
+
+    def test_import(self):
+        """Загрузка создаёт записи, счётчики, ленты и поисковый индекс"""
+        self.load(self.write('data.jsonl', RECORDS), batch_size=2)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertTrue(post.image.name.startswith('posts/small'))
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get().author.username, 'reader')
+        self.assertTrue(Follow.objects.filter(
+            user__username='reader', author__username='author'
+        ).exists())
+        self.assertEqual(
+            UserCounters.objects.get(user__username='author').posts_count, 1
+        )
+        self.assertTrue(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(search.search('перенесённый')[0], [post])
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, 'data.jsonl.checkpoint')
+        ))
+
+    def test_resume_from_checkpoint(self):
+        """После сбоя загрузка продолжается с последней пачки"""
+        broken = RECORDS[:3] + [{'type': 'post', 'author': 'missing',
+                                 'text': 'Пост'}]
+        path = self.write('data.jsonl', broken)
+        with self.assertRaises(CommandError):
+            self.load(path, batch_size=3)
+        with open(f'{path}.checkpoint') as checkpoint:
+            self.assertEqual(checkpoint.read(), '3')
+
+        self.write('data.jsonl', RECORDS)
+        self.load(path, batch_size=3)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_csv_with_default_type(self):
+        """CSV читается по заголовку, тип можно задать параметром"""
+        self.load(self.write('users.jsonl', RECORDS[:2]))
+        path = os.path.join(self.directory, 'posts.csv')
+        with open(path, 'w') as source:
+            source.write('author,text,pub_date\n')
+            source.write('author,"Пост, из CSV",2021-05-06 07:08:09\n')
+        self.load(path, type='post')
+        self.assertEqual(Post.objects.get().text, 'Пост, из CSV')
+
+    def test_replayed_batch(self):
+        """Повтор уже загруженной пачки с id ничего не ломает"""
+        records = RECORDS[:4] + [dict(RECORDS[4], id=7)] + RECORDS[5:]
+        path = self.write('data.jsonl', records)
+        self.load(path)
+        self.load(path)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_id_collision(self):
+        """Чужой пост с тем же id останавливает загрузку"""
+        owner = User.objects.create_user(username='owner')
+        Post.objects.create(pk=100, author=owner, text='Свой пост')
+        with self.assertRaisesMessage(CommandError, '[100]'):
+            self.load(self.write('data.jsonl', RECORDS))
+        self.assertEqual(Post.objects.get(pk=100).text, 'Свой пост')
+        self.assertFalse(Comment.objects.exists())
+
+    def test_triggers_restored_after_failure(self):
+        """После сбоя загрузки новые посты снова попадают в поиск"""
+        broken = RECORDS[:3] + [{'type': 'post', 'author': 'missing',
+                                 'text': 'Пост'}]
+        with self.assertRaises(CommandError):
+            self.load(self.write('data.jsonl', broken), batch_size=3)
+        post = Post.objects.create(
+            author=User.objects.get(username='author'), text='Новый пост'
+        )
+        self.assertEqual(search.search('новый')[0], [post])
+
+    def test_image_names_not_reused(self):
+        """Картинка не подменяется файлом с тем же именем в хранилище"""
+        existing = default_storage.save('posts/small.gif',
+                                        ContentFile(b'site upload'))
+        os.makedirs(os.path.join(self.directory, 'other'))
+        with open(os.path.join(self.directory, 'other', 'small.gif'),
+                  'wb') as image:
+            image.write(SMALL_GIF + b'other')
+        records = RECORDS[:3] + [
+            {'type': 'post', 'id': 101, 'author': 'author',
+             'text': 'Первый', 'image': 'small.gif'},
+            {'type': 'post', 'id': 102, 'author': 'author',
+             'text': 'Второй', 'image': 'other/small.gif'},
+        ]
+        self.load(self.write('data.jsonl', records))
+        first = Post.objects.get(pk=101).image
+        second = Post.objects.get(pk=102).image
+        self.assertNotIn(existing, (first.name, second.name))
+        self.assertNotEqual(first.name, second.name)
+        self.assertEqual(first.read(), SMALL_GIF)
+        self.assertEqual(second.read(), SMALL_GIF + b'other')
@@ -0,0 +1,89 @@
+from django.db import connection
+from django.test import TestCase
+
+from core.paginator import NEXT, CursorPaginator
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class FeedQueryPlanTests(TestCase):
+    """Запросы лент идут по индексам и без сортировки во временном B-tree"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_uses_index(self, queryset, index, ordering):
+        paginator = CursorPaginator(queryset, 10, ordering=ordering)
+        cursor = paginator.encode_cursor(NEXT, paginator.object_list[0])
+        _, values = paginator.decode_cursor(cursor)
+        pages = {
+            'первая страница': paginator.object_list,
+            'страница по курсору': paginator.object_list.filter(
+                paginator._after(values, backward=False)
+            ),
+        }
+        for name, page in pages.items():
+            with self.subTest(index=index, page=name):
+                plan = self.plan(page[:11])
+                self.assertTrue(
+                    any(index in step for step in plan), plan
+                )
+                self.assertFalse(
+                    any('TEMP B-TREE' in step for step in plan), plan
+                )
+
+    def test_profile_feed(self):
+        """Лента профиля читается по индексу автора"""
+        self.assert_uses_index(
+            self.author.posts.for_feed(),
+            'post_author_pub_date_idx',
+            ('-pub_date', '-id'),
+        )
+
+    def test_group_feed(self):
+        """Лента группы читается по индексу группы"""
+        self.assert_uses_index(
+            self.group.posts.for_feed(),
+            'post_group_pub_date_idx',
+            ('-pub_date', '-id'),
+        )
+
+    def test_index_feed(self):
+        """Главная лента читается по индексу даты"""
+        self.assert_uses_index(
+            Post.objects.for_feed(),
+            'posts_post_pub_date',
+            ('-pub_date', '-id'),
+        )
+
+    def test_post_comments(self):
+        """Комментарии поста читаются по индексу поста"""
+        self.assert_uses_index(
+            self.post.comments.select_related('author'),
+            'comment_post_created_idx',
+            ('created', 'id'),
+        )
+
+    def test_follow_feed(self):
+        """Лента подписок читается по индексу записей ленты"""
+        self.assert_uses_index(
+            TimelineEntry.objects.filter(user=self.reader),
+            'timeline_feed_idx',
+            ('-pub_date', '-post_id'),
+        )
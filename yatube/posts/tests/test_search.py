@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post, User
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.exact = Post.objects.create(
+            author=cls.user, text='Кот и ещё раз кот'
+        )
+        cls.partial = Post.objects.create(
+            author=cls.user, text='Длинный пост, где кот упомянут '
+                                  'лишь однажды среди множества слов'
+        )
+        cls.other = Post.objects.create(author=cls.user, text='Про собак')
+
+    def found(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response.context['posts'], response.context['next_cursor']
+
+    def test_results_ranked_by_bm25(self):
+        """Поиск находит посты и сортирует их по релевантности"""
+        posts, _ = self.found('кот')
+        self.assertEqual(posts, [self.exact, self.partial])
+
+    def test_index_follows_writes(self):
+        """Индекс обновляется при изменении и удалении постов"""
+        Post.objects.filter(pk=self.other.pk).update(text='Про котов')
+        self.assertIn(self.other, self.found('кот')[0])
+        Post.objects.filter(pk=self.exact.pk).delete()
+        self.assertNotIn(self.exact, self.found('кот')[0])
+
+    def test_keyset_pages(self):
+        """Результаты листаются по курсору"""
+        posts, cursor = search.search('кот', limit=1)
+        self.assertEqual(posts, [self.exact])
+        posts, cursor = self.found('кот', cursor=cursor)
+        self.assertEqual(posts, [self.partial])
+        self.assertIsNone(cursor)
+
+    def test_rebuild_command(self):
+        """Команда перестраивает индекс с нуля"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {search.TABLE}({search.TABLE}) "
+                "VALUES ('delete-all')"
+            )
+        self.assertEqual(self.found('кот')[0], [])
+        call_command('rebuild_search_index', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.found('кот')[0], [self.exact, self.partial])
+
+    def test_admin_search(self):
+        """Поиск в админке использует полнотекстовый индекс"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.other]
+        )
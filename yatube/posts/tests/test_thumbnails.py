@@ -0,0 +1,95 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from core.models import Job
+from posts import thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name):
+    buffer = BytesIO()
+    Image.new('RGB', (100, 50), color=(200, 0, 0)).save(buffer, 'JPEG')
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def thumbnail_exists(self, name):
+        geometry, options = settings.POST_THUMBNAILS[0]
+        with mock.patch(
+            'sorl.thumbnail.base.ThumbnailBackend._create_thumbnail',
+            side_effect=AssertionError('миниатюра не готова'),
+        ):
+            thumbnail = get_thumbnail(name, geometry, **options)
+        return default_storage.exists(thumbnail.name)
+
+    def test_generate(self):
+        """generate() строит миниатюры заранее"""
+        name = make_image('posts/generate.jpg')
+        thumbnails.generate(name)
+        self.assertTrue(self.thumbnail_exists(name))
+
+    def test_views_schedule_generation(self):
+        """Создание и правка поста с картинкой ставят миниатюры в очередь"""
+        image = ContentFile(
+            default_storage.open(make_image('posts/upload.jpg')).read(),
+            name='upload.jpg',
+        )
+        with mock.patch('posts.views.thumbnails.schedule') as schedule:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                {'text': 'Пост с картинкой', 'image': image},
+            )
+        post = Post.objects.get(text='Пост с картинкой')
+        schedule.assert_called_once_with(post)
+
+    def test_command(self):
+        """Команда строит миниатюры для всех постов"""
+        name = make_image('posts/command.jpg')
+        Post.objects.create(author=self.user, text='Пост', image=name)
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        self.assertTrue(self.thumbnail_exists(name))
+
+    def test_processed_image_not_scheduled(self):
+        """Для обработанной при загрузке картинки миниатюра не строится"""
+        post = Post(author=self.user, image='posts/processed.jpg',
+                    image_width=640, image_height=480)
+        thumbnails.schedule(post)
+        self.assertFalse(Job.objects.exists())
+
+    def test_schedule_enqueues_job(self):
+        """Миниатюры старой картинки строятся задачей из очереди"""
+        name = make_image('posts/queued.jpg')
+        thumbnails.schedule(Post(author=self.user, image=name))
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'posts.thumbnails.generate')
+        call_command('runworker', once=True, workers=1, stdout=StringIO())
+        self.assertTrue(self.thumbnail_exists(name))
+        self.assertFalse(Job.objects.exists())
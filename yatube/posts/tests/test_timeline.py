@@ -0,0 +1,133 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.follows import follow_many, unfollow_many
+from posts.models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        """Подписка кладёт в ленту недавние посты автора"""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post=self.old_post
+            ).exists()
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_unfollow_clears_timeline(self):
+        """Отписка убирает посты автора из ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_big_author_is_pulled(self):
+        """Посты популярного автора читаются напрямую, без раздачи"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_rebuild(self):
+        """rebuild_timelines заполняет ленты по подпискам"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    @override_settings(TIMELINE_MAX_LENGTH=2)
+    def test_timeline_trimmed(self):
+        """В ленте остаются только TIMELINE_MAX_LENGTH новых записей"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=f'Пост {n}')
+                 for n in range(3)]
+        # Запись поста не обходит ленты: их обрезает задача.
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 4
+        )
+        call_command('runworker', once=True, workers=1, stdout=StringIO())
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=self.reader)
+                .values_list('post_id', flat=True)),
+            {posts[1].pk, posts[2].pk},
+        )
+
+    @override_settings(MAX_NUMBER_POST=2)
+    def test_pages_by_cursor(self):
+        """Лента листается по курсору записей ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=f'Пост {n}')
+                 for n in range(2)]
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        page = response.context['page_obj']
+        self.assertEqual(list(page), [posts[1], posts[0]])
+        response = self.reader_client.get(
+            reverse('posts:follow_index'), {'cursor': page.next_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_author_drops_below_limit(self):
+        """Посты, написанные в бытность автора большим, не пропадают"""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        follow = Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+        follow.delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_bulk_unfollow_refills(self):
+        """Массовая отписка тоже раздаёт посты переставшего быть большим"""
+        other = User.objects.create_user(username='other')
+        follow_many([(self.reader.pk, self.author.pk),
+                     (other.pk, self.author.pk)])
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        unfollow_many(Follow.objects.filter(user=other))
+        self.assertEqual(self.feed(), [post, self.old_post])
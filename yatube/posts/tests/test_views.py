@@ -1,12 +1,21 @@
+import base64
+import json
 import shutil
 import tempfile
+from unittest import mock
 from django.conf import settings
 from django.core.cache import cache
-from django.test import Client, TestCase, override_settings
+from django.db import connection, transaction
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
+from django.template import Context, Template
 
-from posts.models import Group, Post, User
+from posts import cache as feed_cache
+from posts.models import Comment, Follow, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -126,7 +135,8 @@ class PostPagesTests(TestCase):
     def test_cache_page(self):
         """Кэширование главной страницы"""
         cache_content = self.guest_client.get(reverse('posts:index')).content
-        Post.objects.all().delete()
+        # update() не отправляет сигналы, и кэш не сбрасывается.
+        Post.objects.update(text='Изменённый текст')
         cache_content2 = self.guest_client.get(reverse('posts:index')).content
 
         self.assertEqual(cache_content, cache_content2)
@@ -135,3 +145,352 @@ class PostPagesTests(TestCase):
         cache_content3 = self.guest_client.get(reverse('posts:index')).content
 
         self.assertNotEqual(cache_content, cache_content3)
+
+    def test_cache_invalidation(self):
+        """Запись поста или комментария сбрасывает кэш его лент"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                content = self.guest_client.get(url).content
+                self.assertEqual(self.guest_client.get(url).content, content)
+                post = Post.objects.create(
+                    author=self.user, group=self.group, text='Новый пост'
+                )
+                self.assertNotEqual(
+                    self.guest_client.get(url).content, content
+                )
+                post.delete()
+
+        url = reverse('posts:index')
+        content = self.guest_client.get(url).content
+        self.post.comments.create(author=self.user, text='Комментарий')
+        self.assertNotEqual(self.guest_client.get(url).content, content)
+
+    def test_cache_not_shared_between_users(self):
+        """Страница пользователя не попадает из кэша другим и анонимам"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        alice = Client()
+        alice.force_login(User.objects.create_user(username='alice'))
+        bob = Client()
+        bob.force_login(User.objects.create_user(username='bob'))
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(alice.get(url), 'alice')
+                self.assertNotContains(self.guest_client.get(url), 'alice')
+                self.assertNotContains(bob.get(url), 'alice')
+
+    def test_author_rename_invalidation(self):
+        """Смена имени автора сбрасывает кэш лент с его постами"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Лев'
+        user.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Лев')
+
+
+class FeedVersionTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_again_after_commit(self):
+        """Страница, собранная до фиксации подписки, не остаётся в кэше"""
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        namespace = feed_cache.profile_namespace(author.username)
+        with transaction.atomic():
+            Follow.objects.create(user=reader, author=author)
+            # Параллельное чтение ещё видит старые данные.
+            during = feed_cache.get_version(namespace)
+        self.assertNotEqual(feed_cache.get_version(namespace), during)
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Пост {number}')
+            for number in range(settings.MAX_NUMBER_POST + 5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def get_page(self, **params):
+        response = self.client.get(reverse('posts:index'), params)
+        return response.context['page_obj']
+
+    def test_next_and_previous_cursor(self):
+        """Курсоры ведут на соседние страницы без сдвигов"""
+        first_page = self.get_page()
+        self.assertEqual(len(first_page), settings.MAX_NUMBER_POST)
+        self.assertIsNone(first_page.previous_cursor)
+        self.assertEqual(first_page[0], self.posts[-1])
+
+        Post.objects.create(author=self.user, text='Свежий пост')
+        second_page = self.get_page(cursor=first_page.next_cursor)
+        self.assertEqual(list(second_page), self.posts[4::-1])
+        self.assertIsNone(second_page.next_cursor)
+
+        back_page = self.get_page(cursor=second_page.previous_cursor)
+        self.assertEqual(list(back_page), list(first_page))
+
+    def test_deep_page_without_count(self):
+        """Страница по курсору не выполняет COUNT(*) и OFFSET"""
+        cursor = self.get_page().next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'), {'cursor': cursor})
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_legacy_page_number(self):
+        """Старые ссылки ?page=N продолжают работать"""
+        page = self.get_page(page=2)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(page), 5)
+
+    def test_broken_cursor(self):
+        """Некорректный курсор открывает первую страницу"""
+        cursors = ['broken'] + [
+            base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+            for data in (
+                ['n', [1], 1],
+                ['n', None, None],
+                ['n', True, 1],
+                ['n', 'не дата', 'не число'],
+                ['n', '2020-01-01T00:00:00', {}],
+                'n',
+            )
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                page = self.get_page(cursor=cursor)
+                self.assertEqual(page[0], self.posts[-1])
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание',
+        )
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def create_posts(self, count):
+        for _ in range(count):
+            author = User.objects.create_user(
+                username=f'user{User.objects.count()}'
+            )
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(author=author, group=self.group, text='Пост')
+            Post.objects.create(author=self.author, group=self.group,
+                                text='Пост')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+        )
+        self.create_posts(1)
+        few = [self.count_queries(url) for url in urls]
+        self.create_posts(settings.MAX_NUMBER_POST)
+        many = [self.count_queries(url) for url in urls]
+        self.assertEqual(few, many)
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Старый текст')
+
+    def setUp(self):
+        cache.clear()
+
+    def render_cards(self):
+        template = Template(
+            '{% load post_tags %}{% post_cards posts as cards %}'
+            '{% for card in cards %}{{ card }}{% endfor %}'
+        )
+        posts = Post.objects.for_feed()
+        return template.render(Context({'posts': posts}))
+
+    def test_card_is_cached_until_post_changes(self):
+        """Карточка берётся из кэша, пока пост не изменён"""
+        self.assertIn('Старый текст', self.render_cards())
+        Post.objects.update(text='Новый текст')
+        self.assertIn('Старый текст', self.render_cards())
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.save()
+        self.assertIn('Новый текст', self.render_cards())
+
+    def test_card_follows_author_name(self):
+        """Смена имени автора сбрасывает его карточки"""
+        self.render_cards()
+        User.objects.filter(pk=self.user.pk).update(first_name='Лев')
+        self.assertIn('Лев', self.render_cards())
+
+    def test_cards_fetched_with_one_cache_call(self):
+        """Карточки страницы читаются одним запросом к кэшу"""
+        Post.objects.create(author=self.user, text='Второй пост')
+        self.render_cards()
+        with mock.patch.object(
+            cache, 'get_many', wraps=cache.get_many
+        ) as get_many, mock.patch(
+            'posts.templatetags.post_tags.render_to_string'
+        ) as render_to_string:
+            self.render_cards()
+        self.assertEqual(get_many.call_count, 1)
+        render_to_string.assert_not_called()
+
+
+@override_settings(MAX_NUMBER_COMMENT=3)
+class PostCommentsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'user{number}'),
+                text=f'Комментарий {number}',
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        self.detail_url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def test_first_comments_in_order(self):
+        """На странице поста первые комментарии по дате создания"""
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:3])
+        self.assertIsNotNone(comments.next_cursor)
+
+    def test_fragment_returns_next_batch(self):
+        """Фрагмент отдаёт следующую порцию комментариев"""
+        first = self.client.get(self.detail_url).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': first.next_cursor},
+        )
+        self.assertEqual(list(response.context['comments']),
+                         self.comments[3:])
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'js-more-comments')
+
+    def test_comment_authors_without_extra_queries(self):
+        """Авторы комментариев выбираются тем же запросом"""
+        with override_settings(MAX_NUMBER_COMMENT=1), \
+                CaptureQueriesContext(connection) as few:
+            self.client.get(self.detail_url)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.detail_url)
+        self.assertEqual(len(few), len(many))
+
+
+class ConditionalPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self):
+        return [
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:group_list', args=[self.group.slug]),
+        ]
+
+    def test_revalidation_in_one_query(self):
+        """Перепроверка неизменившейся страницы — 304 и один запрос"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response['Cache-Control'], 'max-age=0')
+                headers = {
+                    'HTTP_IF_MODIFIED_SINCE': response['Last-Modified'],
+                    'HTTP_IF_NONE_MATCH': response['ETag'],
+                }
+                for header, value in headers.items():
+                    with self.assertNumQueries(1):
+                        revalidated = self.client.get(url, **{header: value})
+                    self.assertEqual(revalidated.status_code, 304)
+
+    def test_changes_reset_etag(self):
+        """Комментарий и правка поста меняют ETag страниц"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Комментари')
+
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        self.post.text = 'Новый текст'
+        self.post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Новый текст')
+
+    def test_authorized_pages_unconditional(self):
+        """Страницы авторизованных пользователей отдаются без условий"""
+        client = Client()
+        client.force_login(self.author)
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertFalse(response.has_header('ETag'))
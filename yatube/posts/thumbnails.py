@@ -0,0 +1,68 @@
+"""Заранее подготовленные миниатюры и копии картинок постов.
+
+Миниатюры всех размеров из POST_THUMBNAILS и копии для srcset и в
+современных форматах (posts.images) строятся задачей в очереди
+(core.jobs) сразу после сохранения поста, а не в запросе и не при
+первом просмотре страницы.
+Размеры должны совпадать с тегами {% thumbnail %} в шаблонах: тогда
+шаблон находит готовую миниатюру в хранилище ключей sorl-thumbnail.
+Размеры и форматы картинки записываются в пост только после того, как
+копии сохранены; до этого шаблон показывает миниатюру.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from core import jobs
+from posts import cache, counters, images
+from posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def generate(name):
+    """Построить все миниатюры для файла из хранилища."""
+    for geometry, options in settings.POST_THUMBNAILS:
+        get_thumbnail(name, geometry, **options)
+    width, height, formats = images.save_variants(name)
+    formats = ','.join(formats)
+    changed = Post.objects.filter(image=name).exclude(
+        image_width=width, image_height=height, image_formats=formats
+    )
+    authors_and_groups = list(changed.values_list('author_id', 'group_id'))
+    # update() не шлёт сигналов: страницы с постом, их ETag и
+    # Last-Modified обновляются здесь же.
+    changed.update(
+        image_width=width,
+        image_height=height,
+        image_formats=formats,
+        updated=timezone.now(),
+    )
+    for author_id, group_id in authors_and_groups:
+        counters.touch(author_id, group_id)
+        cache.invalidate_post(author_id, group_id)
+
+
+def generate_safely(name):
+    """Построить миниатюры; вернуть текст ошибки или None."""
+    try:
+        generate(name)
+    except Exception as error:
+        logger.exception('Не удалось построить миниатюры для %s', name)
+        return str(error)
+    finally:
+        connections.close_all()
+    return None
+
+
+def schedule(post):
+    """Поставить построение миниатюр и копий поста в очередь задач.
+
+    Картинке с готовыми копиями (с image_width) строить нечего.
+    """
+    if not post.image or post.image_width:
+        return
+    jobs.enqueue(generate, post.image.name)
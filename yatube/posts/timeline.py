@@ -0,0 +1,272 @@
+"""Лента подписок с раздачей постов при записи (fan-out on write).
+
+Новый пост сразу копируется в ленты подписчиков автора, поэтому
+follow_index читает готовую ленту пользователя вместо соединения через
+Follow по всем постам всех авторов. Посты авторов, у которых не меньше
+TIMELINE_FANOUT_LIMIT подписчиков, не раздаются: такие авторы
+подмешиваются в ленту при чтении. Число подписчиков везде берётся из
+UserCounters.followers_count; когда автор опускается ниже порога,
+refill_dropped() раздаёт его недавние посты всем подписчикам.
+
+Запись ленты хранит дату поста, и ленту без таких авторов page()
+листает по индексу (user, -pub_date, -post) таблицы записей. В ленте
+остаются не больше TIMELINE_MAX_LENGTH последних записей: старые
+обрезает задача в очереди (core.jobs) после раздачи, чтобы запись поста
+не ждала обхода лент всех подписчиков.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core import jobs
+from core.paginator import CursorPaginator
+from posts.models import Follow, Post, TimelineEntry, UserCounters
+
+
+def big_authors(author_ids):
+    """Авторы из author_ids, чьи посты не раздаются по лентам."""
+    return set(
+        UserCounters.objects.filter(
+            user_id__in=author_ids,
+            followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Добавить пост в ленты подписчиков автора."""
+    if big_authors([post.author_id]):
+        return
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers],
+        ignore_conflicts=True,
+    )
+    if followers:
+        jobs.enqueue(trim, followers)
+
+
+def backfill(user_id, author_id):
+    """Положить в ленту недавние посты автора после подписки."""
+    if big_authors([author_id]):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts],
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def trim(user_ids=None):
+    """Оставить в лентах не больше TIMELINE_MAX_LENGTH новых записей.
+
+    Без user_ids обрезаются все ленты.
+    """
+    if user_ids is None:
+        _trim_all()
+        return
+    limit = settings.TIMELINE_MAX_LENGTH
+    table = TimelineEntry._meta.db_table
+    # Граница — первая лишняя запись, найденная по индексу ленты; у
+    # ленты короче предела её нет, и сравнение с NULL ничего не удаляет.
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(f"""
+            DELETE FROM {table}
+            WHERE user_id = %s AND (pub_date, post_id) <= (
+                SELECT pub_date, post_id FROM {table}
+                WHERE user_id = %s
+                ORDER BY pub_date DESC, post_id DESC
+                LIMIT 1 OFFSET %s
+            )
+        """, [(user_id, user_id, limit) for user_id in user_ids])
+
+
+def _trim_all():
+    table = TimelineEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            DELETE FROM {table} WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY user_id
+                        ORDER BY pub_date DESC, post_id DESC
+                    ) AS position
+                    FROM {table}
+                )
+                WHERE position > %s
+            )
+        """, [settings.TIMELINE_MAX_LENGTH])
+
+
+def remove(user_id, author_id):
+    """Убрать посты автора из ленты после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def pull_authors(user):
+    """Авторы из подписок, чьи посты читаются напрямую."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    return user.follower.filter(
+        author__counters__followers_count__gte=limit
+    ).values_list('author_id', flat=True)
+
+
+def feed_for(user):
+    """Посты ленты подписок пользователя."""
+    pull = list(pull_authors(user))
+    if not pull:
+        return Post.objects.filter(timeline_entries__user=user)
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(Q(id__in=entries) | Q(author_id__in=pull))
+
+
+def newest(user):
+    """(pub_date, id) самого нового поста ленты из её записей."""
+    return (
+        TimelineEntry.objects.filter(user=user)
+        .order_by('-pub_date', '-post_id')
+        .values_list('pub_date', 'post_id')
+        .first()
+    )
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорная пагинация по записям ленты.
+
+    Страница выбирается по индексу записей ленты, затем её посты
+    загружаются по id. Курсор совпадает с курсором по постам
+    (pub_date, id), потому что запись хранит те же значения.
+    """
+
+    def __init__(self, user, posts, per_page):
+        self.posts = posts
+        super().__init__(
+            TimelineEntry.objects.filter(user=user),
+            per_page,
+            ordering=('-pub_date', '-post_id'),
+        )
+
+    def get_page(self, cursor=None):
+        page = super().get_page(cursor)
+        posts = self.posts.in_bulk([entry.post_id for entry in page])
+        page.object_list = [posts[entry.post_id] for entry in page
+                            if entry.post_id in posts]
+        return page
+
+
+def page(user, cursor, per_page):
+    """Страница ленты подписок по курсору."""
+    if pull_authors(user).exists():
+        # Посты больших авторов есть только в posts_post: ленту
+        # приходится собирать из двух источников и сортировать.
+        paginator = CursorPaginator(feed_for(user).for_feed(), per_page)
+    else:
+        paginator = TimelinePaginator(user, Post.objects.for_feed(),
+                                      per_page)
+    return paginator.get_page(cursor)
+
+
+def _fill(user_ids=None, author_ids=None, ignore_conflicts=False):
+    """Разложить недавние посты небольших авторов по лентам подписчиков.
+
+    user_ids и author_ids ограничивают читателей и авторов. Нумеруются
+    только посты авторов, на которых подписаны эти читатели, а не вся
+    таблица постов.
+    """
+    where = ''
+    author_filter = ''
+    user_params = []
+    author_params = []
+    if user_ids is not None:
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        where = f'WHERE follow.user_id IN ({placeholders})'
+        user_params = list(user_ids)
+    if author_ids is not None:
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        author_filter = f'WHERE author_id IN ({placeholders})'
+        author_params = list(author_ids)
+    elif user_ids is not None:
+        author_filter = f"""WHERE author_id IN (
+            SELECT author_id FROM {Follow._meta.db_table}
+            WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})
+        )"""
+        author_params = user_params
+    params = [
+        settings.TIMELINE_FANOUT_LIMIT,
+        *author_params,
+        settings.TIMELINE_BACKFILL,
+        *user_params,
+    ]
+    insert = connection.ops.insert_statement(
+        ignore_conflicts=ignore_conflicts
+    )
+    query = f"""
+        {insert} {TimelineEntry._meta.db_table}
+            (user_id, post_id, pub_date)
+        SELECT DISTINCT follow.user_id, post.id, post.pub_date
+        FROM {Follow._meta.db_table} AS follow
+        JOIN {UserCounters._meta.db_table} AS counters
+            ON counters.user_id = follow.author_id
+            AND counters.followers_count < %s
+        JOIN (
+            SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+            ) AS position
+            FROM {Post._meta.db_table}
+            {author_filter}
+        ) AS post
+            ON post.author_id = follow.author_id
+            AND post.position <= %s
+        {where}
+        {connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts)}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+
+
+def refill_dropped(author_ids):
+    """Раздать посты авторов, которые перестали быть большими.
+
+    author_ids — авторы, бывшие большими до изменения подписок. Их
+    посты не раздавались, а pull_authors их больше не читает.
+    """
+    author_ids = list(set(author_ids) - big_authors(author_ids))
+    if not author_ids:
+        return
+    _fill(author_ids=author_ids, ignore_conflicts=True)
+    trim(
+        Follow.objects.filter(author_id__in=author_ids)
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+
+
+def rebuild(user_ids=None):
+    """Заново заполнить ленты по текущим подпискам.
+
+    Без user_ids перестраиваются все ленты, иначе только ленты этих
+    пользователей.
+    """
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        entries.delete()
+        if user_ids == []:
+            return
+        _fill(user_ids)
+        trim(user_ids)
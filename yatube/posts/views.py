@@ -1,24 +1,45 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.core.paginator import Paginator
-from django.views.decorators.cache import cache_page
 from django.shortcuts import render, get_object_or_404
 from django.shortcuts import redirect
 from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
 
-from posts.models import Post, Group, Follow, User
-from posts.forms import PostForm, CommentForm
+from core.paginator import CursorPaginator
+from posts import export
+from posts import search as post_search
+from posts import images, thumbnails, timeline
+from posts.cache import (
+    INDEX, cache_feed, conditional_for_anonymous, group_namespace,
+    profile_namespace
+)
+from posts.models import Post, Group, Follow, User, UserCounters
+from posts.forms import PostForm, CommentForm, ExportForm
 
 
 def get_paginator(request, posts, posts_per_page):
-    paginator = Paginator(posts, posts_per_page)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        # Старые ссылки вида ?page=N продолжают работать.
+        paginator = Paginator(posts, posts_per_page)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, posts_per_page)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def get_comments(post, cursor):
+    comments = post.comments.select_related('author')
+    paginator = CursorPaginator(
+        comments, settings.MAX_NUMBER_COMMENT, ordering=('created', 'id')
+    )
+    return paginator.get_page(cursor)
 
 
-@cache_page(20, key_prefix='/')
+@cache_feed(INDEX)
 def index(request):
-    posts = Post.objects.all()
+    posts = Post.objects.for_feed()
     page_obj = get_paginator(request, posts, settings.MAX_NUMBER_POST)
     context = {
         'page_obj': page_obj,
@@ -26,9 +47,32 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+def group_stamp(slug):
+    return Group.objects.filter(slug=slug).values_list(
+        'updated', flat=True
+    ).first()
+
+
+def profile_stamp(username):
+    return UserCounters.objects.filter(user__username=username).values_list(
+        'updated', flat=True
+    ).first()
+
+
+def post_stamp(post_id):
+    stamps = Post.objects.filter(pk=post_id).values_list(
+        'updated', 'author__counters__updated'
+    ).first()
+    if stamps is None:
+        return None
+    return max(stamp for stamp in stamps if stamp is not None)
+
+
+@conditional_for_anonymous(group_stamp)
+@cache_feed(group_namespace)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author', 'group')
+    posts = group.posts.for_feed()
     page_obj = get_paginator(request, posts, settings.MAX_NUMBER_POST)
     context = {
         'page_obj': page_obj,
@@ -37,9 +81,14 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_for_anonymous(profile_stamp)
+@cache_feed(profile_namespace)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username,
+    )
+    posts = author.posts.for_feed()
     page_obj = get_paginator(request, posts, settings.MAX_NUMBER_POST)
     following = request.user.is_authenticated
     if following:
@@ -52,28 +101,81 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_for_anonymous(post_stamp)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post.objects.select_related('author', 'group'),
-                             pk=post_id)
-    comments = post.comments.select_related('post')
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id,
+    )
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments': get_comments(post, request.GET.get('comments')),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев без остальной страницы поста."""
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments(post, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def post_image(request, post_id):
+    """Перенаправить на копию картинки в лучшем для клиента формате.
+
+    Формат выбирается по заголовку Accept, ширина — по параметру w.
+    Для клиентов, которые не разбирают <picture>, например приложений.
+    """
+    post = get_object_or_404(
+        Post.objects.only('image', 'image_width', 'image_formats')
+        .exclude(image=''),
+        pk=post_id,
+    )
+    if post.image_width is None:
+        return redirect(post.image.url)
+    width = request.GET.get('w', '')
+    response = redirect(images.best_url(
+        post,
+        request.META.get('HTTP_ACCEPT', ''),
+        # isdigit() пропустил бы '²', на котором int() падает.
+        int(width) if width.isdecimal() else None,
+    ))
+    patch_vary_headers(response, ('Accept',))
+    patch_cache_control(response, max_age=settings.POST_IMAGE_REDIRECT_AGE)
+    return response
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = post_search.search(
+        query,
+        cursor=request.GET.get('cursor'),
+        limit=settings.MAX_NUMBER_POST,
+    )
+    context = {
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     is_edit = False
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
 
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
 
         return redirect('posts:profile', post.author.username)
 
@@ -99,7 +201,9 @@ def post_edit(request, post_id):
     )
 
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id=post_id)
 
     context = {
@@ -124,9 +228,15 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user)
-    page_obj = get_paginator(request, posts, settings.MAX_NUMBER_POST)
+    if request.GET.get('page') is not None:
+        posts = timeline.feed_for(request.user).for_feed()
+        page_obj = get_paginator(request, posts, settings.MAX_NUMBER_POST)
+    else:
+        page_obj = timeline.page(
+            request.user,
+            request.GET.get('cursor'),
+            settings.MAX_NUMBER_POST,
+        )
     context = {
         'page_obj': page_obj,
     }
@@ -154,3 +264,20 @@ def profile_unfollow(request, username):
     )
     follower.delete()
     return redirect('posts:profile', username)
+
+
+@staff_member_required
+def export_posts(request):
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    kind = form.cleaned_data['kind']
+    format = form.cleaned_data['format']
+    response = StreamingHttpResponse(
+        export.lines(**form.cleaned_data),
+        content_type=export.CONTENT_TYPES[format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{format}"'
+    )
+    return response
@@ -1,6 +1,7 @@
 import os
 
 MAX_NUMBER_POST = 10
+MAX_NUMBER_COMMENT = 20
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -42,6 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -56,7 +61,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,6 +90,35 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения (core.db). Локально это копии db.sqlite3,
+# число которых задаёт YATUBE_DB_REPLICAS; их обновляет
+# python manage.py sync_replicas --interval 5.
+DATABASE_REPLICAS = [
+    f'replica{number}'
+    for number in range(int(os.environ.get('YATUBE_DB_REPLICAS', 0)))
+]
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+
+# Страницы, которые читают из реплик, — имена URL или шаблоны fnmatch.
+DATABASE_REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'admin:*_changelist',
+)
+# Сколько секунд после записи клиент читает только из default; должно
+# быть больше отставания реплик.
+DATABASE_PIN_SECONDS = 15
+# Срок кэша страниц лент, собранных по данным реплики (posts.cache).
+DATABASE_REPLICA_CACHE_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -124,12 +158,23 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+# Без DEBUG collectstatic пишет имена с хешем и сжатые копии .gz и .br
+# (core.static), а StaticFilesMiddleware отдаёт их сам, если перед
+# проектом нет CDN или nginx. Файлы с хешем кэшируются на STATIC_MAX_AGE.
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.static.CompressedManifestStaticFilesStorage'
+STATIC_SERVE = not DEBUG
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма ставятся в очередь задач (core.mail) и отправляются командой
+# runworker через QUEUED_EMAIL_BACKEND.
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+QUEUED_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # Отрабатывает ошибку 403
@@ -142,8 +187,113 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш в два уровня: короткоживущий LRU в памяти процесса перед общим
+# для всех процессов кэшем. В разработке общий уровень заменяет
+# LocMemCache, в бою — файловый кэш (или memcached).
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache.TwoLevelCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_TIMEOUT': 5,
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_MAX_BYTES': 16 * 1024 * 1024,
+            # Версии лент (posts.cache) должны сразу меняться во всех
+            # процессах.
+            'SHARED_ONLY': ('feed-version:',),
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'shared',
+    } if DEBUG else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # Счётчики core.ratelimit: нужен атомарный incr, общий для всех
+    # процессов. У FileBasedCache incr — это get и set, поэтому в
+    # продакшене memcached.
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ratelimit',
+    } if DEBUG else {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ.get('YATUBE_MEMCACHED', '127.0.0.1:11211'),
+    },
+}
+
+# Лента подписок: посты авторов с таким числом подписчиков не раздаются
+# по лентам, а подмешиваются при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке.
+TIMELINE_BACKFILL = 100
+# Сколько последних записей хранится в ленте подписок; более старые
+# посты из ленты пропадают.
+TIMELINE_MAX_LENGTH = 1000
+
+# Страницы лент сбрасываются сигналами (posts.cache), поэтому могут
+# храниться в кэше долго.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Карточки постов в кэше фрагментов. Ключ меняется при правке поста;
+# срок ограничивает устаревание имени автора в карточке.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Миниатюры, которые строятся задачей в очереди после загрузки
+# картинки поста (posts.thumbnails). Размеры совпадают с
+# {% thumbnail %} в шаблонах.
+POST_THUMBNAILS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+
+# Обработка загруженных картинок постов (posts.images): предельный
+# размер файла и число пикселей, длинная сторона после уменьшения,
+# качество JPEG и ширины уменьшенных копий для srcset.
+POST_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIZE = 2048
+POST_IMAGE_QUALITY = 82
+POST_IMAGE_WIDTHS = (320, 640, 960, 1280)
+# Сколько секунд клиенты могут кэшировать перенаправление
+# /posts/<id>/image/ на копию в подходящем формате.
+POST_IMAGE_REDIRECT_AGE = 60 * 60
+
+# Замеры запросов: доля замеряемых запросов и отдача заголовка
+# Server-Timing. Гистограммы доступны персоналу по /admin/metrics/.
+METRICS_SAMPLE_RATE = 0.1
+METRICS_SERVER_TIMING = True
+
+# Ограничения частоты запросов (core.ratelimit) по именам URL: ключ
+# корзины ('user' или 'ip'), не больше N запросов за секунду, минуту,
+# час или день и методы, которые считаются.
+RATELIMIT_CACHE = 'ratelimit'
+RATELIMITS = {
+    'posts:post_create': {'key': 'user', 'rate': '10/m',
+                          'methods': ['POST']},
+    'posts:add_comment': {'key': 'user', 'rate': '20/m',
+                          'methods': ['POST']},
+    'posts:profile_follow': {'key': 'user', 'rate': '30/m'},
+    'users:login': {'key': 'ip', 'rate': '10/m', 'methods': ['POST']},
+    'users:signup': {'key': 'ip', 'rate': '5/h', 'methods': ['POST']},
 }
+# Адреса и сети обратных прокси, которым можно верить в
+# X-Forwarded-For: за ними IP клиента берётся из этого заголовка.
+RATELIMIT_TRUSTED_PROXIES = os.environ.get(
+    'YATUBE_TRUSTED_PROXIES', '127.0.0.1,::1'
+).split(',')
+
+# Очередь фоновых задач (core.jobs): число попыток, задержка перед
+# повтором (удваивается с каждой попыткой) и её предел, через сколько
+# секунд задача зависшего воркера возвращается в очередь и как часто
+# runworker проверяет очередь.
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 30
+JOB_RETRY_MAX_DELAY = 60 * 60
+JOB_TIMEOUT = 10 * 60
+JOB_POLL_INTERVAL = 1
+
+# Предел холодного старта для теста startup_profile, мс: от запуска
+# интерпретатора до ответа на первый запрос. Тест запускается только
+# с переменной окружения YATUBE_STARTUP_TEST.
+STARTUP_BUDGET_MS = 3000